@@ -0,0 +1,122 @@
+# 访问令牌
+# 登录时签发 HMAC-SHA256 签名的无状态令牌（itsdangerous，密钥为 SECRET_KEY），载荷中带用户 id 与权限，
+# 校验只需验签并检查签发时间，不查数据库，多个 worker 进程之间也不需要共享会话。
+# 令牌无法单独吊销，有效期由 AUTH_TOKEN_MAX_AGE 控制；更换 SECRET_KEY 会让所有已签发的令牌失效。
+# 管理员权限不只看令牌中的 auth，还要以用户记录（LRU 缓存）为准：降权或删除后最多 AUTH_USER_CACHE_TTL 秒失效
+import hashlib
+from functools import wraps
+
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from cache import LRUBackend
+from models import User
+
+
+class TokenAuth:
+    """令牌签发与校验，用法与 Flask 扩展一致：token_auth.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.serializer = None
+        self.max_age = 7 * 24 * 3600
+        self.user_cache = LRUBackend(1024)
+        self.user_cache_ttl = 60
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUTH_TOKEN_MAX_AGE', 7 * 24 * 3600)
+        app.config.setdefault('AUTH_USER_CACHE_SIZE', 1024)
+        app.config.setdefault('AUTH_USER_CACHE_TTL', 60)
+        self.serializer = URLSafeTimedSerializer(
+            app.config['SECRET_KEY'], salt='access-token',
+            signer_kwargs={'digest_method': hashlib.sha256}
+        )
+        self.max_age = app.config['AUTH_TOKEN_MAX_AGE']
+        self.user_cache = LRUBackend(app.config['AUTH_USER_CACHE_SIZE'])
+        self.user_cache_ttl = app.config['AUTH_USER_CACHE_TTL']
+
+    def issue(self, user):
+        """为用户签发访问令牌"""
+        return self.serializer.dumps({'uid': user.id, 'auth': user.authority or 0})
+
+    def verify(self, token):
+        """返回令牌载荷，签名无效或已过期时返回 None"""
+        try:
+            return self.serializer.loads(token, max_age=self.max_age)
+        except BadSignature:
+            return None
+
+    def load_user(self, user_id):
+        """按 id 取用户信息（User.to_dict() 的结果），优先从 LRU 中读取"""
+        data = self.user_cache.get(user_id)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        data = user.to_dict()
+        self.user_cache.set(user_id, data, self.user_cache_ttl)
+        return data
+
+    def forget_user(self, user_id):
+        """用户信息修改或删除后调用"""
+        self.user_cache.delete(user_id)
+
+
+token_auth = TokenAuth()
+
+
+def _authenticate():
+    """从 Authorization: Bearer <token> 中解析当前用户，结果保存在 g 中"""
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    payload = token_auth.verify(token.strip()) if scheme.lower() == 'bearer' else None
+    if payload is None:
+        return False
+    g.user_id = payload['uid']
+    g.authority = payload['auth']
+    return True
+
+
+def login_required(view):
+    """要求请求携带有效的访问令牌，视图中通过 g.user_id / g.authority 取当前用户"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _authenticate():
+            return jsonify({'error': '未登录或登录已过期'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def is_admin():
+    """当前用户是否为管理员，需在 login_required 的视图中调用
+
+    令牌中的权限不是管理员时直接返回 False，不查用户；否则再以用户记录为准，
+    避免被降权或删除的管理员在令牌有效期内继续使用管理员权限
+    """
+    if g.authority != 1:
+        return False
+    user = token_auth.load_user(g.user_id)
+    return user is not None and user['authority'] == 1
+
+
+def admin_required(view):
+    """要求当前用户为管理员（authority == 1）"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _authenticate():
+            return jsonify({'error': '未登录或登录已过期'}), 401
+        if not is_admin():
+            return jsonify({'error': '无权访问'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def current_user():
+    """当前用户的完整信息，需在 login_required 的视图中调用"""
+    return token_auth.load_user(g.user_id)
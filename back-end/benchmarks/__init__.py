@@ -0,0 +1 @@
+# 性能基准脚本，在 back-end 目录下用 python -m benchmarks.<脚本名> 运行
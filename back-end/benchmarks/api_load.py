@@ -0,0 +1,218 @@
+# 主要接口的压测
+# 在进程内直接调用应用的 WSGI 入口（不经过网络），用若干线程并发请求各接口，每个接口单独压测
+# --duration 秒，统计吞吐量与 p50/p95/p99 延迟，结果写入 JSON，可用 --compare 与之前的结果对比。
+# 数据集由 db_init.seed_bulk 生成：--db 指向的库为空时先按给定规模生成（默认规模本地约 25 秒），
+# 之后重复使用同一个库。请求的 environ 在计时之前构造，延迟只包含应用本身的处理时间。
+#
+# 用法（在 back-end 目录下）：
+#   python -m benchmarks.api_load --db /tmp/blog-bench.db --output before.json
+#   python -m benchmarks.api_load --db /tmp/blog-bench.db --output after.json --compare before.json
+import argparse
+import json
+import platform
+import random
+import secrets
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+import sqlalchemy
+from werkzeug.test import EnvironBuilder
+
+from main import create_app
+from migrations import upgrade
+from models import db, User, Article, Tag, Like
+from auth import token_auth
+from db_init import SEED_SIZES, SEED_PASSWORD, check_seed_sizes, seed_bulk
+from benchmarks.login_storm import percentile
+from stats import site_stats
+from view_counter import view_counter
+
+# 接口 -> 按随机数生成一个请求 (method, path, json, headers)
+SCENARIOS = {
+    'get_articles': lambda ctx, rng: (
+        'GET', f'/api/articles?page={rng.randint(1, 50)}&per_page=10', None, None),
+    'get_article': lambda ctx, rng: (
+        'GET', f'/api/articles/{rng.randint(1, ctx["articles"])}', None, None),
+    'like_article': lambda ctx, rng: (
+        'POST', f'/api/articles/{rng.randint(1, ctx["articles"])}/like', {},
+        {'Authorization': f'Bearer {rng.choice(ctx["tokens"])}'}),
+    'get_hot_articles': lambda ctx, rng: (
+        'GET', '/api/articles/hot?limit=10', None, None),
+    'get_stats': lambda ctx, rng: (
+        'GET', '/api/stats', None, None),
+    'login': lambda ctx, rng: (
+        'POST', '/api/login', {'username': f'user{rng.randint(1, ctx["users"])}', 'password': SEED_PASSWORD}, None),
+}
+
+
+def call(app, environ):
+    """调用一次 WSGI 应用并读完响应体，返回状态码"""
+    status = []
+
+    def start_response(value, headers, exc_info=None):
+        status.append(value)
+
+    body = app(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(status[0].split(' ', 1)[0])
+
+
+def run_scenario(app, ctx, name, duration, concurrency, warmup, seed):
+    make_request = SCENARIOS[name]
+
+    def build(rng):
+        method, path, body, headers = make_request(ctx, rng)
+        return EnvironBuilder(method=method, path=path, json=body, headers=headers).get_environ()
+
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        call(app, build(rng))
+
+    deadline = time.perf_counter() + duration
+    results = []
+
+    def worker(index):
+        rng = random.Random(f'{seed}-{name}-{index}')
+        latencies, statuses = [], []
+        while time.perf_counter() < deadline:
+            environ = build(rng)
+            started = time.perf_counter()
+            status = call(app, environ)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses.append(status)
+        results.append((latencies, statuses))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [value for items, _ in results for value in items]
+    statuses = [value for _, items in results for value in items]
+    return {
+        'requests': len(latencies),
+        'server_errors': sum(1 for status in statuses if status >= 500),
+        'client_errors': sum(1 for status in statuses if 400 <= status < 500),
+        'rps': round(len(latencies) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2) if latencies else 0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results, previous):
+    print(f'\n{"接口":<18}{"rps":>18}{"p95_ms":>22}{"p99_ms":>22}')
+    for name, current in results.items():
+        old = previous.get('results', {}).get(name)
+        if not old:
+            continue
+        columns = []
+        for key in ('rps', 'p95_ms', 'p99_ms'):
+            change = (current[key] - old[key]) / old[key] * 100 if old[key] else 0
+            columns.append(f'{old[key]:>8} -> {current[key]:<8}({change:+.0f}%)')
+        print(f'{name:<18}' + ''.join(f'{column:>22}' for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='主要接口的压测')
+    parser.add_argument('--db', required=True, help='SQLite 数据库文件路径，为空库时先生成数据集')
+    for size_name, value in SEED_SIZES.items():
+        parser.add_argument(f'--{size_name}', type=int, default=value, help=f'生成数据集时的 {size_name} 行数')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='要压测的接口，逗号分隔')
+    parser.add_argument('--duration', type=float, default=10, help='每个接口压测的秒数')
+    parser.add_argument('--concurrency', type=int, default=4, help='并发线程数')
+    parser.add_argument('--warmup', type=int, default=20, help='每个接口正式计时前的预热请求数')
+    parser.add_argument('--no-cache', action='store_true', help='关闭响应缓存')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    parser.add_argument('--output', help='结果 JSON 文件')
+    parser.add_argument('--compare', help='之前的结果 JSON 文件，打印与其对比')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'未知的接口: {", ".join(unknown)}，可选: {", ".join(SCENARIOS)}')
+    try:
+        check_seed_sizes(args.users, args.tags, args.articles, args.likes, chunk_size=1)
+    except ValueError as e:
+        parser.error(str(e))
+
+    app = create_app({
+        'SECRET_KEY': secrets.token_hex(16),
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{args.db}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_BINDS': {},
+        'RESPONSE_CACHE_ENABLED': not args.no_cache,
+        'LOG_LEVEL': 'ERROR',
+    })
+    with app.app_context():
+        upgrade()
+        if db.session.query(User.id).first() is None:
+            print('生成数据集 ...')
+            print(seed_bulk(args.users, args.tags, args.articles, args.likes, args.seed))
+        dataset = {
+            'users': db.session.query(db.func.count(User.id)).scalar(),
+            'tags': db.session.query(db.func.count(Tag.id)).scalar(),
+            'articles': db.session.query(db.func.count(Article.id)).scalar(),
+            'likes': db.session.query(db.func.count(Like.id)).scalar(),
+        }
+        users = User.query.order_by(User.id).limit(200).all()
+        ctx = {**dataset, 'tokens': [token_auth.issue(user) for user in users]}
+        db.session.remove()
+
+    print(f'数据集: {dataset}，并发 {args.concurrency}，每个接口 {args.duration}s')
+    results = {}
+    for name in names:
+        results[name] = run_scenario(app, ctx, name, args.duration, args.concurrency, args.warmup, args.seed)
+        item = results[name]
+        print(f'{name:<18} {item["requests"]:>7} req  {item["rps"]:>8} req/s  p50={item["p50_ms"]}ms  '
+              f'p95={item["p95_ms"]}ms  p99={item["p99_ms"]}ms  5xx={item["server_errors"]}')
+
+    # 写回压测期间累积的浏览量与统计增量，下次运行时数据一致
+    with app.app_context():
+        view_counter.flush()
+        site_stats.flush()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'dataset': dataset,
+            'duration': args.duration,
+            'concurrency': args.concurrency,
+            'response_cache': not args.no_cache,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
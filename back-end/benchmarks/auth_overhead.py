@@ -0,0 +1,70 @@
+# 每个请求的鉴权开销
+# 分别测量：令牌验签、LRU 命中取用户、按主键查询用户，以及带令牌请求 /api/me（LRU 命中与未命中）
+# 相对于不鉴权的 /api/users/<id> 的端到端耗时。
+#
+# 用法（在 back-end 目录下）：python -m benchmarks.auth_overhead -n 5000
+import argparse
+import os
+import secrets
+import tempfile
+import time
+
+from main import create_app
+from migrations import upgrade
+from models import db, User
+from auth import token_auth
+
+
+def per_call_us(func, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return round((time.perf_counter() - start) / n * 1e6, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='每个请求的鉴权开销')
+    parser.add_argument('-n', type=int, default=5000, help='每项测量的次数')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app({
+        'SECRET_KEY': secrets.token_hex(16),
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_BINDS': {},
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+    with app.app_context():
+        upgrade()
+        user = User(username='bench', authority=0)
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        token = token_auth.issue(user)
+
+        results = {
+            'verify_token': per_call_us(lambda: token_auth.verify(token), args.n),
+            'load_user_lru_hit': per_call_us(lambda: token_auth.load_user(user_id), args.n),
+            'load_user_db': per_call_us(lambda: (User.query.get(user_id), db.session.expunge_all()), args.n),
+        }
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    results['request_no_auth'] = per_call_us(lambda: client.get(f'/api/users/{user_id}'), args.n)
+    results['request_token_lru_hit'] = per_call_us(lambda: client.get('/api/me', headers=headers), args.n)
+
+    def uncached():
+        token_auth.forget_user(user_id)
+        client.get('/api/me', headers=headers)
+    results['request_token_lru_miss'] = per_call_us(uncached, args.n)
+    os.remove(path)
+
+    for name, value in results.items():
+        print(f'{name:<24} {value:>8} us')
+
+
+if __name__ == '__main__':
+    main()
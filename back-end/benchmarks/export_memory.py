@@ -0,0 +1,87 @@
+# 流式导出的内存上限检查
+# 在临时 SQLite 库中批量写入若干行用户与文章（默认各 20 万），通过 /api/admin/export/* 以
+# NDJSON 和 CSV 各导出一遍，用 tracemalloc 统计导出期间的内存峰值；超过上限时以非零状态退出。
+#
+# 用法（在 back-end 目录下）：python -m benchmarks.export_memory --rows 200000 --ceiling-mb 16
+import argparse
+import os
+import secrets
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from main import create_app
+from migrations import upgrade
+from models import db, User, Article
+from auth import token_auth
+
+
+def seed(rows, chunk=10000):
+    now = datetime.utcnow()
+    users = User.__table__
+    articles = Article.__table__
+    for start in range(0, rows, chunk):
+        ids = range(start + 1, min(rows, start + chunk) + 1)
+        db.session.execute(users.insert(), [
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+             'authority': 1 if i == 1 else 0, 'created_at': now, 'updated_at': now}
+            for i in ids
+        ])
+        db.session.execute(articles.insert(), [
+            {'id': i, 'title': f'文章 {i}', 'content': '正文内容 ' * 40, 'excerpt': '摘要',
+             'author_id': i, 'status': 'published', 'views': 0, 'likes_count': 0,
+             'created_at': now, 'updated_at': now}
+            for i in ids
+        ])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式导出的内存上限检查')
+    parser.add_argument('--rows', type=int, default=200000, help='用户与文章各写入的行数')
+    parser.add_argument('--ceiling-mb', type=float, default=16, help='导出期间允许的内存峰值（MB）')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app({
+        'SECRET_KEY': secrets.token_hex(16),
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_BINDS': {},
+    })
+    with app.app_context():
+        upgrade()
+        seed(args.rows)
+        token = token_auth.issue(User.query.get(1))
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    failed = False
+    for table in ('users', 'articles'):
+        for fmt in ('ndjson', 'csv'):
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get(f'/api/admin/export/{table}?format={fmt}', headers=headers, buffered=False)
+            size = lines = 0
+            for chunk in response.response:
+                size += len(chunk)
+                lines += chunk.count(b'\n')
+            response.close()
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+
+            ok = peak <= args.ceiling_mb
+            failed = failed or not ok
+            print(f'{table:<8} {fmt:<6} lines={lines} size={size / 1024 / 1024:.1f}MB '
+                  f'time={elapsed:.1f}s peak={peak:.1f}MB {"OK" if ok else "超出上限"}')
+    os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# 列表接口的字段投影对比
+# 在临时 SQLite 库中写入若干篇带长正文的文章，对文章列表与用户文章列表分别以默认的摘要字段和
+# fields=detail 重复请求，打印每次响应的字节数与 SQL 耗时、请求耗时的中位数，以及两者之比。
+# 用于确认列表默认不取正文带来的收益。
+#
+# 用法（在 back-end 目录下）：python -m benchmarks.field_projection --articles 2000 --content-chars 4000
+import argparse
+import json
+import os
+import secrets
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from main import create_app
+from migrations import upgrade
+from models import db, User, Article
+from profiler import PROFILE_HEADER
+from stats import site_stats
+from view_counter import view_counter
+
+PATHS = (
+    '/api/articles?per_page=50',
+    '/api/users/1/articles?per_page=50',
+)
+
+
+def seed(articles, content_chars):
+    now = datetime.utcnow()
+    content = ('正文内容' * (content_chars // 4 + 1))[:content_chars]
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'password_hash': 'x', 'authority': 0, 'created_at': now, 'updated_at': now}
+        for i in range(1, 11)
+    ])
+    db.session.execute(Article.__table__.insert(), [
+        {'id': i, 'title': f'文章 {i}', 'content': content, 'excerpt': content[:200], 'author_id': i % 10 + 1,
+         'status': 'published', 'views': i, 'likes_count': 0, 'created_at': now, 'updated_at': now}
+        for i in range(1, articles + 1)
+    ])
+    db.session.commit()
+
+
+def measure(client, url, repeat):
+    """重复请求 url，返回 (响应字节数, SQL 耗时中位数 ms, 请求耗时中位数 ms)"""
+    size = 0
+    db_ms = []
+    total_ms = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url, headers={PROFILE_HEADER: '1'})
+        total_ms.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.data
+        size = len(response.data)
+        db_ms.append(json.loads(response.headers[PROFILE_HEADER])['db_ms'])
+    return size, statistics.median(db_ms), statistics.median(total_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列表接口的字段投影对比')
+    parser.add_argument('--articles', type=int, default=2000, help='写入的文章数')
+    parser.add_argument('--content-chars', type=int, default=4000, help='每篇正文的字数')
+    parser.add_argument('--repeat', type=int, default=50, help='每个接口的请求次数')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app({
+        'SECRET_KEY': secrets.token_hex(16),
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_BINDS': {},
+        'SQL_PROFILER_ENABLED': True,
+        'RESPONSE_CACHE_ENABLED': False,
+        'LOG_REQUEST_SAMPLE_RATE': 0,
+    })
+    with app.app_context():
+        upgrade()
+        seed(args.articles, args.content_chars)
+        db.session.remove()
+
+    client = app.test_client()
+    for url in PATHS:
+        summary = measure(client, url, args.repeat)
+        detail = measure(client, f'{url}&fields=detail', args.repeat)
+        print(url)
+        for name, (size, db_ms, total_ms) in (('summary', summary), ('detail', detail)):
+            print(f'    {name:<8} bytes={size:<9} db={db_ms:.2f}ms total={total_ms:.2f}ms')
+        print(f'    detail/summary bytes={detail[0] / summary[0]:.1f}x db={detail[1] / max(summary[1], 0.01):.1f}x '
+              f'total={detail[2] / max(summary[2], 0.01):.1f}x')
+
+    # 删除临时库之前写回浏览量与统计增量，避免退出时写入已删除的库
+    with app.app_context():
+        view_counter.flush()
+        site_stats.flush()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
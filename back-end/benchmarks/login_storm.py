@@ -0,0 +1,115 @@
+# 登录洪峰下其他接口的延迟
+# 在进程内启动应用（临时 SQLite 库），若干线程持续登录的同时，另一个线程反复请求
+# 与密码无关的接口，统计其延迟分位数。分别测量请求线程内直接哈希（PASSWORD_HASH_WORKERS=0）
+# 与线程池哈希两种配置，对比线程池限制哈希并发后其他接口的 p99。
+#
+# 用法（在 back-end 目录下）：python -m benchmarks.login_storm --logins 16 --duration 10
+import argparse
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+from main import create_app
+from migrations import upgrade
+from models import db, User, Article
+from passwords import password_hasher
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(workers, logins, duration, probe_path):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app({
+        'SECRET_KEY': secrets.token_hex(16),
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_BINDS': {},
+        'RESPONSE_CACHE_ENABLED': False,
+        'PASSWORD_HASH_WORKERS': workers,
+    })
+    with app.app_context():
+        upgrade()
+        user = User(username='storm', authority=0)
+        user.set_password('storm-password')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Article(title='probe', content='probe', author_id=user.id))
+        db.session.commit()
+
+    stop = threading.Event()
+    login_counts = {'ok': 0, 'busy': 0}
+    counts_lock = threading.Lock()
+
+    def storm():
+        client = app.test_client()
+        while not stop.is_set():
+            r = client.post('/api/login', json={'username': 'storm', 'password': 'storm-password'})
+            with counts_lock:
+                login_counts['ok' if r.status_code == 200 else 'busy'] += 1
+
+    latencies = []
+
+    def probe():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get(probe_path)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # 先测无负载时的基线
+    client = app.test_client()
+    baseline = []
+    for _ in range(200):
+        start = time.perf_counter()
+        client.get(probe_path)
+        baseline.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=storm) for _ in range(logins)] + [threading.Thread(target=probe)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    os.remove(path)
+
+    return {
+        'workers': workers,
+        'baseline_p99_ms': round(percentile(baseline, 99), 2),
+        'probe_requests': len(latencies),
+        'probe_p50_ms': round(percentile(latencies, 50), 2),
+        'probe_p95_ms': round(percentile(latencies, 95), 2),
+        'probe_p99_ms': round(percentile(latencies, 99), 2),
+        'logins_per_s': round(login_counts['ok'] / duration, 1),
+        'logins_rejected': login_counts['busy'],
+        'hasher': password_hasher.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='登录洪峰下其他接口的延迟')
+    parser.add_argument('--logins', type=int, default=16, help='并发登录线程数')
+    parser.add_argument('--duration', type=float, default=10, help='每种配置的测量秒数')
+    parser.add_argument('--workers', type=int, default=2, help='线程池哈希并发数')
+    parser.add_argument('--probe', default='/api/users/1', help='测量延迟的接口')
+    args = parser.parse_args()
+
+    for workers in (0, args.workers):
+        result = run(workers, args.logins, args.duration, args.probe)
+        hasher = result.pop('hasher')
+        label = '请求线程内哈希' if workers <= 0 else f'线程池哈希 (workers={workers})'
+        print(f'{label}: {result}')
+        if workers > 0:
+            print(f'  线程池: {hasher}')
+
+
+if __name__ == '__main__':
+    main()
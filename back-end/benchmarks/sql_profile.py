@@ -0,0 +1,107 @@
+# 各读接口的 SQL 条数检查
+# 在临时 SQLite 库中写入少量用户、标签、文章与点赞，开启 SQL 分析后依次请求主要的读接口，
+# 打印每个接口执行的 SQL 条数、耗时与疑似 N+1 的语句；任何接口出现 N+1 时以非零状态退出。
+# 用于在改动序列化、分页等代码后确认没有引入逐行查询。
+#
+# 用法（在 back-end 目录下）：python -m benchmarks.sql_profile --articles 50
+import argparse
+import json
+import os
+import secrets
+import sys
+import tempfile
+from datetime import datetime
+
+from main import create_app
+from migrations import upgrade
+from models import db, User, Article, Tag, ArticleTag, Like
+from profiler import PROFILE_HEADER
+from stats import site_stats
+from view_counter import view_counter
+
+PATHS = (
+    '/api/articles?per_page=20',
+    '/api/articles?per_page=20&viewer_id=1',
+    '/api/articles?cursor=&per_page=20',
+    '/api/articles/1',
+    '/api/articles/hot?limit=20',
+    '/api/articles/search?q=文章',
+    '/api/tags?with_counts=1',
+    '/api/tags/popular',
+    '/api/users',
+    '/api/users/1',
+    '/api/users/1/articles',
+    '/api/users/1/likes',
+    '/api/articles/1/like?user_id=1',
+    '/api/stats',
+    '/api/stats/daily',
+    '/api/passages',
+)
+
+
+def seed(articles, tags=10):
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'password_hash': 'x', 'authority': 0, 'created_at': now, 'updated_at': now}
+        for i in range(1, 11)
+    ])
+    db.session.execute(Tag.__table__.insert(), [
+        {'id': i, 'name': f'标签{i}', 'color': 'blue', 'created_at': now} for i in range(1, tags + 1)
+    ])
+    db.session.execute(Article.__table__.insert(), [
+        {'id': i, 'title': f'文章 {i}', 'content': '正文内容 ' * 40, 'excerpt': '摘要', 'author_id': i % 10 + 1,
+         'status': 'published', 'views': i, 'likes_count': 0, 'created_at': now, 'updated_at': now}
+        for i in range(1, articles + 1)
+    ])
+    db.session.execute(ArticleTag.__table__.insert(), [
+        {'article_id': i, 'tag_id': tag_id, 'created_at': now}
+        for i in range(1, articles + 1) for tag_id in {i % tags + 1, (i * 7) % tags + 1}
+    ])
+    db.session.execute(Like.__table__.insert(), [
+        {'user_id': 1, 'article_id': i, 'created_at': now} for i in range(1, articles + 1, 2)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='各读接口的 SQL 条数检查')
+    parser.add_argument('--articles', type=int, default=50, help='写入的文章数')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    app = create_app({
+        'SECRET_KEY': secrets.token_hex(16),
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLALCHEMY_BINDS': {},
+        'SQL_PROFILER_ENABLED': True,
+        'RESPONSE_CACHE_ENABLED': False,
+        'LOG_REQUEST_SAMPLE_RATE': 0,
+    })
+    with app.app_context():
+        upgrade()
+        seed(args.articles)
+        db.session.remove()
+
+    client = app.test_client()
+    failed = False
+    for url in PATHS:
+        response = client.get(url, headers={PROFILE_HEADER: '1'})
+        profile = json.loads(response.headers[PROFILE_HEADER])
+        failed = failed or bool(profile['n_plus_one'])
+        print(f'{url:<42} status={response.status_code} queries={profile["queries"]:<3} '
+              f'db={profile["db_ms"]}ms {"N+1" if profile["n_plus_one"] else "OK"}')
+        for item in profile['n_plus_one']:
+            print(f'    x{item["count"]}: {item["sql"]}')
+
+    # 删除临时库之前写回浏览量与统计增量，避免退出时写入已删除的库
+    with app.app_context():
+        view_counter.flush()
+        site_stats.flush()
+    os.remove(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# 接口响应缓存
+# 读多写少的接口（文章列表、热门文章、标签、统计）按 “接口 + 规范化后的查询参数” 缓存整个响应，
+# 写接口通过标签失效：每个标签有一个版本号，缓存键中带上版本号，失效时只需把版本号加一，
+# 旧版本的缓存自然不再命中，随后被 LRU / TTL 淘汰。这种方式不需要维护 “标签 -> 键” 索引，
+# 因此同样适用于多进程共享的外部后端
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, current_app
+
+
+class LRUBackend:
+    """进程内 LRU + TTL 缓存后端（默认）"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._versions = {}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def size(self):
+        return len(self._data)
+
+    # 标签版本号单独存放，不参与 LRU 淘汰，否则版本号被淘汰后归零会让旧缓存重新生效
+    def get_version(self, tag):
+        return self._versions.get(tag, 0)
+
+    def incr_version(self, tag):
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    """Redis 兼容后端，多个 worker 进程共享缓存与标签版本号
+
+    client 只需支持 get / set(ex=) / incr，例如 redis.Redis()。
+    淘汰由 Redis 自身的 maxmemory 策略和过期时间完成，evictions 不在这里统计。
+    """
+
+    def __init__(self, client, prefix='blog:cache:'):
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def clear(self):
+        # 使用外部后端时由各标签的版本号失效，不做全量删除
+        pass
+
+    def size(self):
+        return None
+
+    def get_version(self, tag):
+        return int(self.client.get(f'{self.prefix}version:{tag}') or 0)
+
+    def incr_version(self, tag):
+        self.client.incr(f'{self.prefix}version:{tag}')
+
+
+class ResponseCache:
+    """响应缓存，用法与 Flask 扩展一致：response_cache.init_app(app)"""
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        self.default_ttl = 30
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 30)
+        self.enabled = app.config['RESPONSE_CACHE_ENABLED']
+        self.default_ttl = app.config['RESPONSE_CACHE_TTL']
+        if self.backend is None:
+            self.backend = LRUBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+
+    def cached(self, *tags, ttl=None):
+        """缓存 GET 接口的 200 响应，tags 为该接口依赖的数据标签"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                key = self._make_key(tags)
+                cached = self.backend.get(key)
+                if cached is not None:
+                    self.hits += 1
+                    return current_app.response_class(cached, mimetype='application/json')
+
+                self.misses += 1
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    self.backend.set(key, response.get_data(), ttl or self.default_ttl)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """使依赖这些标签的缓存全部失效"""
+        for tag in tags:
+            self.backend.incr_version(tag)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0,
+            'evictions': self.backend.evictions,
+            'size': self.backend.size()
+        }
+
+    def _make_key(self, tags):
+        # 查询参数排序后拼接，参数顺序不同的请求共用同一条缓存
+        args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+        versions = ','.join(f'{tag}:{self.backend.get_version(tag)}' for tag in tags)
+        return f'{request.endpoint}?{args}|{versions}'
+
+
+response_cache = ResponseCache()
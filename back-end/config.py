@@ -1,8 +1,118 @@
-# 数据库配置
-DB_USER = 'root'
-DB_PASSWORD = '286369'
-DB_HOST = 'localhost'
-DB_NAME = 'test'
+import os
 
-SQLALCHEMY_DATABASE_URI = f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+# 数据库配置，均可通过环境变量覆盖；DATABASE_URL 优先于分项配置
+DB_USER = os.environ.get('DB_USER', 'root')
+DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
+DB_HOST = os.environ.get('DB_HOST', 'localhost')
+DB_NAME = os.environ.get('DB_NAME', 'test')
+
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}'
+)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# 连接池：pre_ping 在取出连接时探活，避免空闲后使用已被 MySQL 断开的连接；
+# recycle 应小于 MySQL 的 wait_timeout；timeout 为连接池耗尽时的最长等待秒数
+DB_POOL_OPTIONS = {
+    'pool_size': _env_int('DB_POOL_SIZE', 10),
+    'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+    'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+    'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+}
+
+def engine_options(uri):
+    """SQLite 不使用连接池参数，其他数据库使用 DB_POOL_OPTIONS"""
+    return {} if uri.startswith('sqlite') else dict(DB_POOL_OPTIONS)
+
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+# 只读副本（可选）：配置后 GET/HEAD 请求中的查询走副本，写操作仍走主库
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+SQLALCHEMY_BINDS = {
+    'replica': {'url': REPLICA_DATABASE_URL, **engine_options(REPLICA_DATABASE_URL)}
+} if REPLICA_DATABASE_URL else {}
+
+# 内部接口（连接池状态等）只允许这些地址访问
+INTERNAL_ALLOWED_IPS = os.environ.get('INTERNAL_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# 浏览量写回缓冲：每隔多少秒、或累计多少次浏览后批量写回数据库；间隔 <= 0 表示不启动后台写回线程，
+# 只在显式调用 flush 或进程退出时写回
+VIEW_COUNTER_FLUSH_INTERVAL = 5
+VIEW_COUNTER_FLUSH_THRESHOLD = 100
+
+# 点赞数对账任务间隔（秒），按 likes 表批量重算 articles.likes_count；<= 0 表示不启用
+LIKES_RECONCILE_INTERVAL = 600
+
+# 接口响应缓存（进程内 LRU + TTL），用于文章列表、热门文章、标签、统计等读多写少的接口
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+RESPONSE_CACHE_TTL = 30
+
+# 热门文章排行：热度 = (浏览量 + 点赞权重 * 点赞数) 按发布时间指数衰减，半衰期单位为小时；
+# 排行在内存中增量维护，并按间隔（秒）从数据库全量重建，<= 0 表示不启用定期重建
+HOT_RANK_LIKE_WEIGHT = 5
+HOT_RANK_HALF_LIFE_HOURS = 48
+HOT_RANK_REBUILD_INTERVAL = 300
+
+# 文章全文搜索：auto 表示 MySQL 上使用 FULLTEXT(ngram) 索引，其他数据库使用进程内倒排索引；
+# 进程内索引每篇文章最多索引的正文字符数，以及与数据库对账的间隔（秒）
+SEARCH_BACKEND = 'auto'
+SEARCH_INDEX_MAX_CHARS = 5000
+SEARCH_INDEX_REFRESH_INTERVAL = 60
+
+# 密码哈希：方法与盐长度（werkzeug 格式，如 pbkdf2:sha256:600000），修改后用户下次登录时自动按新参数重新哈希；
+# 哈希在固定大小的线程池中计算，WORKERS 为并发计算数（<= 0 表示在请求线程中直接计算），
+# MAX_QUEUE 为最多排队数，超出时登录/注册返回 503
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+PASSWORD_HASH_SALT_LENGTH = 16
+PASSWORD_HASH_WORKERS = _env_int('PASSWORD_HASH_WORKERS', 2)
+PASSWORD_HASH_MAX_QUEUE = _env_int('PASSWORD_HASH_MAX_QUEUE', 32)
+
+# 访问令牌：SECRET_KEY 用于 HMAC 签名，必须通过环境变量设置，且所有 worker 一致（未设置时只有调试、
+# 测试模式下可以启动，使用公开的开发用密钥）；令牌有效期（秒），以及按 id 缓存用户信息的 LRU 容量与过期时间（秒）
+SECRET_KEY = os.environ.get('SECRET_KEY')
+DEV_SECRET_KEY = 'dev-secret-key-change-me'
+AUTH_TOKEN_MAX_AGE = _env_int('AUTH_TOKEN_MAX_AGE', 7 * 24 * 3600)
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TTL = 60
+
+# 管理员数据导出（/api/admin/export/*）每批从数据库读取并输出的行数
+EXPORT_BATCH_SIZE = 1000
+
+# 全站统计：增量写入数据库的间隔（秒），按明细表重算的间隔（秒），以及定期重算覆盖的最近天数
+STATS_FLUSH_INTERVAL = 5
+STATS_RECONCILE_INTERVAL = 3600
+STATS_RECONCILE_DAYS = 7
+
+# 日志：级别、输出格式（text 或 json）、输出文件（为空时写 stderr），以及日志队列容量（队列满时丢弃）；
+# 正常请求的访问日志记录比例（5xx 与超过 LOG_SLOW_REQUEST_MS 毫秒的慢请求总是记录），
+# 以及按请求开启 DEBUG 日志的比例（如 0.01 表示 1% 的请求输出调试细节）
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_FILE = os.environ.get('LOG_FILE', '')
+LOG_QUEUE_SIZE = 10000
+LOG_REQUEST_SAMPLE_RATE = _env_float('LOG_REQUEST_SAMPLE_RATE', 1.0)
+LOG_DEBUG_SAMPLE_RATE = _env_float('LOG_DEBUG_SAMPLE_RATE', 0.0)
+LOG_SLOW_REQUEST_MS = _env_int('LOG_SLOW_REQUEST_MS', 500)
+
+# 运行指标（GET /metrics）：是否开启；多进程部署时各 worker 共享的快照目录（为空表示只输出本进程的指标），
+# 以及写入快照的间隔（秒）
+METRICS_ENABLED = _env_bool('METRICS_ENABLED', True)
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+METRICS_WRITE_INTERVAL = 5
+
+# SQL 分析（默认关闭）：开启后记录慢查询（超过 SQL_SLOW_QUERY_MS 毫秒）与疑似 N+1
+# （同一语句在一个请求中执行超过 SQL_N_PLUS_ONE_THRESHOLD 次），请求带 X-SQL-Profile: 1 头时在响应头中返回汇总
+SQL_PROFILER_ENABLED = _env_bool('SQL_PROFILER_ENABLED', False)
+SQL_SLOW_QUERY_MS = _env_int('SQL_SLOW_QUERY_MS', 100)
+SQL_N_PLUS_ONE_THRESHOLD = _env_int('SQL_N_PLUS_ONE_THRESHOLD', 5)
@@ -1,12 +1,37 @@
-from main import app, db
-from models import User, Article, Tag, ArticleTag, Like, Passage
-from datetime import datetime
+from main import create_app
+from models import db
+from migrations import upgrade
+from models import User, Article, Tag, ArticleTag, Like, Passage, make_excerpt, adjust_tag_counts
+from passwords import password_hasher
+from stats import rebuild_stats
+from tasks import rebuild_tag_counts
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import secrets
+import time
+
+# 批量生成数据时的默认规模与所有用户共用的密码
+SEED_SIZES = {'users': 20000, 'tags': 3000, 'articles': 100000, 'likes': 1000000}
+SEED_PASSWORD = 'bench-password'
+
+SEED_WORDS = (
+    '我们', '今天', '系统', '数据', '模型', '学习', '前端', '后端', '接口', '性能', '优化', '缓存', '数据库',
+    '索引', '查询', '用户', '文章', '标签', '点赞', '评论', '设计', '架构', '部署', '容器', '服务', '请求',
+    '响应', '并发', '线程', '进程', '内存', '磁盘', '网络', '安全', '认证', '测试', '监控', '日志', '算法',
+    '结构', '框架', '组件', '状态', '路由', '页面', '样式', '体验', '需求', '版本', '发布', '问题', '方案',
+    '实践', '经验', '总结', '思考', '分享', '入门', '进阶', '原理', '源码', '分析', '技巧', '工具', '效率',
+    '生活', '旅行', '读书', '电影', '音乐', '摄影', '美食', '城市', '季节', '朋友', '时间', '记忆', '故事',
+)
 
 def init_database():
     """初始化数据库"""
+    # 脚本不签发访问令牌，使用随机密钥即可（未设置 SECRET_KEY 时应用拒绝以非调试模式启动）
+    app = create_app({'SECRET_KEY': os.environ.get('SECRET_KEY') or secrets.token_hex(16)})
     with app.app_context():
-        # 创建所有表
-        db.create_all()
+        # 创建/升级所有表
+        upgrade()
         print("数据库表创建成功")
         
         # 检查是否已有数据
@@ -14,7 +39,8 @@ def init_database():
             print("数据库中已有数据，跳过初始化")
             return
         
-        # 创建示例用户
+        # 创建示例用户；密码相同的示例用户共用一次计算出的哈希
+        demo_password_hash = password_hasher.hash('123456')
         admin_user = User(
             username='admin',
             email='admin@example.com',
@@ -31,7 +57,7 @@ def init_database():
             phone='13800138001',
             authority=0
         )
-        user1.set_password('123456')
+        user1.password_hash = demo_password_hash
         
         user2 = User(
             username='python_expert',
@@ -40,7 +66,7 @@ def init_database():
             phone='13800138002',
             authority=0
         )
-        user2.set_password('123456')
+        user2.password_hash = demo_password_hash
         
         user3 = User(
             username='db_engineer',
@@ -49,7 +75,7 @@ def init_database():
             phone='13800138003',
             authority=0
         )
-        user3.set_password('123456')
+        user3.password_hash = demo_password_hash
         
         # 添加一个没有邮箱的用户示例
         user4 = User(
@@ -59,7 +85,7 @@ def init_database():
             phone=None,  # 没有手机号
             authority=0
         )
-        user4.set_password('123456')
+        user4.password_hash = demo_password_hash
         
         db.session.add_all([admin_user, user1, user2, user3, user4])
         db.session.flush()  # 获取用户ID
@@ -266,7 +292,8 @@ SHOW VARIABLES LIKE 'slow_query_log%';</code></pre>
             }
         ]
         
-        # 添加文章和标签关联
+        # 添加文章和标签关联（标签按名称从上面创建的列表中取，不再逐个查询）
+        tags_by_name = {tag.name: tag for tag in tags}
         for article_data in articles_data:
             article = Article(
                 title=article_data['title'],
@@ -281,7 +308,7 @@ SHOW VARIABLES LIKE 'slow_query_log%';</code></pre>
             
             # 添加标签关联
             for tag_name in article_data['tags']:
-                tag = Tag.query.filter_by(name=tag_name).first()
+                tag = tags_by_name.get(tag_name)
                 if tag:
                     article_tag = ArticleTag(article_id=article.id, tag_id=tag.id)
                     db.session.add(article_tag)
@@ -300,7 +327,10 @@ SHOW VARIABLES LIKE 'slow_query_log%';</code></pre>
             like = Like(user_id=user_id, article_id=article_id)
             db.session.add(like)
         
-        # 提交所有更改
+        # 提交所有更改，再按明细数据计算标签文章数与全站统计
+        db.session.commit()
+        rebuild_tag_counts()
+        rebuild_stats(db.session)
         db.session.commit()
         print("示例数据添加成功")
         print(f"创建了 {User.query.count()} 个用户")
@@ -308,5 +338,173 @@ SHOW VARIABLES LIKE 'slow_query_log%';</code></pre>
         print(f"创建了 {Tag.query.count()} 个标签")
         print(f"创建了 {Like.query.count()} 个点赞")
 
+def _zipf_allocation(total, n, alpha, cap):
+    """把 total 按幂律分给 n 个名次（名次 1 最多），每个名次最多 cap"""
+    if n == 0:
+        return []
+    weights = [1 / (rank ** alpha) for rank in range(1, n + 1)]
+    scale = total / sum(weights)
+    counts = [min(cap, int(weight * scale)) for weight in weights]
+    remaining = total - sum(counts)
+    for rank in range(n):
+        if remaining <= 0:
+            break
+        if counts[rank] < cap:
+            counts[rank] += 1
+            remaining -= 1
+    return counts
+
+def _distinct_ids(rng, n, k):
+    """从 1..n 中不重复地取 k 个；k 远小于 n 时逐个抽取，避免 random.sample 每次复制整个范围"""
+    if k * 4 > n:
+        return rng.sample(range(1, n + 1), k)
+    chosen = set()
+    while len(chosen) < k:
+        chosen.add(rng.randint(1, n))
+    return chosen
+
+def _chunks(start, stop, size):
+    for begin in range(start, stop, size):
+        yield begin, min(stop, begin + size)
+
+def check_seed_sizes(users, tags, articles, likes, chunk_size):
+    """检查批量生成的规模参数，不合法时抛出 ValueError"""
+    if users < 1 or tags < 1:
+        raise ValueError('users 与 tags 至少为 1：每篇文章需要作者，且至少关联一个标签')
+    if articles < 0 or likes < 0:
+        raise ValueError('articles 与 likes 不能为负数')
+    if chunk_size < 1:
+        raise ValueError('chunk_size 至少为 1')
+
+def seed_bulk(users=SEED_SIZES['users'], tags=SEED_SIZES['tags'], articles=SEED_SIZES['articles'],
+              likes=SEED_SIZES['likes'], seed=42, chunk_size=10000, log=print):
+    """在空库中批量生成用户、标签、文章、文章-标签关联与点赞（需在应用上下文中调用），返回各表行数与耗时
+
+    标题与正文为随机拼接的中文，文章热度与标签使用频率按幂律分布；随机数使用固定种子，相同参数生成的数据完全相同。
+    全部用 Core 批量插入，每 chunk_size 篇文章（及其标签关联、点赞）一个事务；所有用户共用一个预先计算的
+    密码哈希（密码为 SEED_PASSWORD）。标签的已发布文章数在生成时累计、最后一次写入，全站统计最后按明细数据重算。
+    """
+    check_seed_sizes(users, tags, articles, likes, chunk_size)
+    if db.session.query(User.id).first() is not None:
+        raise RuntimeError('数据库中已有数据，只能在空库中批量生成数据')
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    password_hash = password_hasher.hash(SEED_PASSWORD)
+    # 整个生成过程使用同一个连接；SQLite 的页缓存随连接保留，写入点赞表的唯一索引时不会反复从磁盘读入索引页
+    conn = db.engine.connect()
+    if conn.dialect.name == 'sqlite':
+        conn.exec_driver_sql('PRAGMA cache_size = -262144')
+        conn.exec_driver_sql('PRAGMA synchronous = OFF')
+    try:
+        report = _seed_rows(conn, rng, users, tags, articles, likes, chunk_size, password_hash, log)
+    finally:
+        conn.close()
+
+    adjust_tag_counts(report.pop('tag_counts'))
+    rebuild_stats(db.session)
+    db.session.commit()
+    return {**report, 'seed': seed, 'elapsed_seconds': round(time.perf_counter() - started, 1)}
+
+def _seed_rows(conn, rng, users, tags, articles, likes, chunk_size, password_hash, log):
+    now = datetime.utcnow().replace(microsecond=0)
+    epoch = now - timedelta(days=365)
+
+    for begin, end in _chunks(1, users + 1, chunk_size):
+        with conn.begin():
+            conn.execute(User.__table__.insert(), [
+                {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password_hash,
+                 'real_name': f'用户{i}', 'authority': 1 if i == 1 else 0,
+                 'created_at': epoch + timedelta(seconds=i), 'updated_at': epoch + timedelta(seconds=i)}
+                for i in range(begin, end)
+            ])
+    log(f"用户 {users}")
+
+    with conn.begin():
+        conn.execute(Tag.__table__.insert(), [
+            {'id': i, 'name': f'{rng.choice(SEED_WORDS)}{i}', 'color': 'blue', 'published_count': 0,
+             'created_at': epoch}
+            for i in range(1, tags + 1)
+        ])
+    log(f"标签 {tags}")
+
+    # 先确定每篇文章的状态与点赞数：已发布文章按随机名次分配幂律的点赞数，草稿没有点赞
+    published = [rng.random() < 0.95 for _ in range(articles)]
+    published_ids = [i + 1 for i, flag in enumerate(published) if flag]
+    rng.shuffle(published_ids)
+    like_counts = dict(zip(published_ids, _zipf_allocation(likes, len(published_ids), 0.7, users)))
+    tag_cum_weights = []
+    total = 0
+    for rank in range(1, tags + 1):
+        total += 1 / rank
+        tag_cum_weights.append(total)
+    tag_ids = range(1, tags + 1)
+    paragraphs = [''.join(rng.choice(SEED_WORDS) for _ in range(rng.randint(20, 60))) + '。' for _ in range(500)]
+    offsets = sorted(rng.randrange(365 * 24 * 3600) for _ in range(articles))
+
+    article_tag_rows = like_rows = 0
+    tag_counts = {}
+    for begin, end in _chunks(1, articles + 1, chunk_size):
+        rows, links, like_batch = [], [], []
+        for i in range(begin, end):
+            content = '\n\n'.join(rng.sample(paragraphs, rng.randint(3, 8)))
+            created_at = epoch + timedelta(seconds=offsets[i - 1])
+            liked = like_counts.get(i, 0)
+            rows.append({
+                'id': i, 'title': ''.join(rng.choices(SEED_WORDS, k=rng.randint(2, 5))) + f' {i}',
+                'content': content, 'excerpt': make_excerpt(content), 'author_id': rng.randint(1, users),
+                'status': 'published' if published[i - 1] else 'draft',
+                'views': liked * rng.randint(5, 30) + rng.randint(0, 100), 'likes_count': liked,
+                'created_at': created_at, 'updated_at': created_at,
+            })
+            for tag_id in set(rng.choices(tag_ids, cum_weights=tag_cum_weights, k=rng.randint(1, 3))):
+                links.append({'article_id': i, 'tag_id': tag_id, 'created_at': created_at})
+                if published[i - 1]:
+                    tag_counts[tag_id] = tag_counts.get(tag_id, 0) + 1
+            age = max(1, int((now - created_at).total_seconds()))
+            for user_id in _distinct_ids(rng, users, liked):
+                like_batch.append({'user_id': user_id, 'article_id': i,
+                                   'created_at': created_at + timedelta(seconds=rng.randrange(age))})
+        # 空列表的 executemany 会生成一条只含默认值的 INSERT，批次为空时跳过（点赞稀疏时整批文章可能都没有点赞）
+        with conn.begin():
+            for table, batch in ((Article.__table__, rows), (ArticleTag.__table__, links), (Like.__table__, like_batch)):
+                if batch:
+                    conn.execute(table.insert(), batch)
+        article_tag_rows += len(links)
+        like_rows += len(like_batch)
+        log(f"文章 {end - 1}/{articles}，点赞 {like_rows}")
+
+    return {
+        'users': users,
+        'tags': tags,
+        'articles': articles,
+        'article_tags': article_tag_rows,
+        'likes': like_rows,
+        'tag_counts': tag_counts,
+    }
+
+def seed_database(sizes, seed=42, chunk_size=10000):
+    """升级表结构后按给定规模批量生成数据"""
+    # 脚本不签发访问令牌，使用随机密钥即可（未设置 SECRET_KEY 时应用拒绝以非调试模式启动）
+    app = create_app({'SECRET_KEY': os.environ.get('SECRET_KEY') or secrets.token_hex(16)})
+    with app.app_context():
+        upgrade()
+        report = seed_bulk(seed=seed, chunk_size=chunk_size, **sizes)
+        print(f"批量生成完成: {report}")
+
 if __name__ == '__main__':
-    init_database()
+    parser = argparse.ArgumentParser(description='初始化数据库：默认写入少量示例数据，--bulk 时按给定规模批量生成')
+    parser.add_argument('--bulk', action='store_true', help='批量生成数据（数据库须为空库）')
+    for name, value in SEED_SIZES.items():
+        parser.add_argument(f'--{name}', type=int, default=value, help=f'批量生成的 {name} 数量（默认 {value}）')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子，相同参数生成的数据完全相同')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='每个事务写入的文章数')
+    args = parser.parse_args()
+
+    if args.bulk:
+        try:
+            check_seed_sizes(*(getattr(args, name) for name in SEED_SIZES), args.chunk_size)
+        except ValueError as e:
+            parser.error(str(e))
+        seed_database({name: getattr(args, name) for name in SEED_SIZES}, args.seed, args.chunk_size)
+    else:
+        init_database()
@@ -0,0 +1,64 @@
+# 数据导出
+# 按主键顺序逐批读取（yield_per，MySQL 上使用服务端游标，不把整张表取到客户端），
+# 边读边输出 NDJSON 或 CSV，以分块响应返回。内存占用只与批大小有关，与表的行数无关。
+# 导出过程中该连接一直被流式查询占用，生成器里不能再执行其他查询
+import csv
+import io
+import json
+from datetime import datetime
+
+from models import db, User, Article
+
+# 格式 -> (MIME 类型, 文件扩展名)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# 导出的列，不包含密码哈希等敏感字段
+USER_EXPORT_COLUMNS = (
+    User.id, User.username, User.email, User.phone, User.real_name,
+    User.authority, User.avatar, User.created_at, User.updated_at,
+)
+ARTICLE_EXPORT_COLUMNS = (
+    Article.id, Article.title, Article.excerpt, Article.content, Article.author_id,
+    Article.status, Article.views, Article.likes_count, Article.created_at, Article.updated_at,
+)
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def export_rows(columns, fmt, batch_size=1000):
+    """按主键顺序流式导出 columns 所在表的所有行，逐批产出 NDJSON/CSV 文本（需在应用上下文中调用）"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    names = [column.key for column in columns]
+    query = db.session.query(*columns).order_by(columns[0]).yield_per(batch_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(names)
+
+    pending = 0
+    for row in query:
+        values = [_format_value(value) for value in row]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(names, values)), ensure_ascii=False))
+            buffer.write('\n')
+        pending += 1
+        # 每批输出一次，避免逐行产出带来的额外开销
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,310 @@
+# 文章批量导入
+# 输入为 NDJSON（每行一篇文章或一个点赞），按 chunk_size 分批，每批一个事务：
+# 作者名与标签名各用一次 IN 查询解析（缺少的标签一次批量创建），文章用 executemany 一次写入后
+# 按主键范围一次读回自增 id，文章-标签关联用 executemany 一次写入，标签的已发布文章数在同一事务中批量增加。
+# 点赞用 executemany 一次写入，文章的点赞数在同一事务中按文章批量增加；点赞可以通过 ref 引用
+# 同一次导入中更早出现的文章。单行数据有误时跳过该行并记录在报告中，不影响其他行
+import json
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import func
+
+from models import db, User, Article, ArticleTag, Like, make_excerpt, check_tag_names, resolve_tag_ids, \
+    adjust_tag_counts, adjust_likes_counts
+from stats import site_stats
+
+STATUSES = ('published', 'draft')
+
+RECORD_TYPES = ('article', 'like')
+
+# 报告中最多保留的错误条数
+MAX_REPORTED_ERRORS = 100
+
+
+def parse_ndjson(lines):
+    """逐行解析 NDJSON，产出 (行号, 记录或 None, 错误或 None)，空行跳过"""
+    for lineno, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield lineno, None, f'JSON 格式错误: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield lineno, None, '每行应为一个 JSON 对象'
+            continue
+        yield lineno, record, None
+
+
+def _user_id(record, id_key, name_key, user_ids, existing_ids, label):
+    """按 id_key（用户 id）或 name_key（用户名）取记录中引用的用户，不存在时抛出 ValueError"""
+    user_id = record.get(id_key)
+    if user_id is not None:
+        if not isinstance(user_id, int) or user_id not in existing_ids:
+            raise ValueError(f'{label}不存在: {user_id}')
+        return user_id
+    if isinstance(record.get(name_key), str):
+        user_id = user_ids.get(record[name_key])
+        if user_id is None:
+            raise ValueError(f'{label}不存在: {record[name_key]}')
+        return user_id
+    raise ValueError(f'缺少必填字段: {id_key} 或 {name_key}')
+
+
+def _created_at(record):
+    created_at = record.get('created_at')
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise ValueError('created_at 应为 ISO 8601 时间')
+    return created_at or datetime.utcnow()
+
+
+def _resolve_users(records, id_key, name_key):
+    """本批记录引用的用户：用户名 -> id 与存在的用户 id，各用一次 IN 查询"""
+    names = {record[name_key] for record in records
+             if record.get(id_key) is None and isinstance(record.get(name_key), str)}
+    user_ids = dict(
+        db.session.query(User.username, User.id).filter(User.username.in_(names)).all()
+    ) if names else {}
+    requested_ids = {record[id_key] for record in records if isinstance(record.get(id_key), int)}
+    existing_ids = {
+        user_id for user_id, in db.session.query(User.id).filter(User.id.in_(requested_ids)).all()
+    } if requested_ids else set()
+    return user_ids, existing_ids
+
+
+def _skip(report, lineno, error):
+    report['skipped'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append({'line': lineno, 'error': error})
+
+
+def _validate(record, author_ids, existing_ids, refs):
+    """校验一条文章记录并返回待插入的行，数据有误时抛出 ValueError
+
+    author_ids 为本批中出现的作者名 -> id，existing_ids 为本批中出现且存在的作者 id，
+    refs 为本次导入中已出现的文章 ref
+    """
+    title = record.get('title')
+    content = record.get('content')
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError('缺少必填字段: title')
+    if len(title) > 200:
+        raise ValueError('标题最多 200 个字符')
+    if not isinstance(content, str) or not content:
+        raise ValueError('缺少必填字段: content')
+
+    author_id = _user_id(record, 'author_id', 'author', author_ids, existing_ids, '作者')
+
+    ref = record.get('ref')
+    if ref is not None and (not isinstance(ref, (str, int)) or ref in refs):
+        raise ValueError(f'ref 应为字符串或整数且在一次导入中唯一: {ref}')
+
+    status = record.get('status', 'published')
+    if status not in STATUSES:
+        raise ValueError(f'不支持的状态: {status}')
+
+    tags = check_tag_names(record.get('tags'))
+    created_at = _created_at(record)
+
+    return {
+        'title': title,
+        'content': content,
+        'excerpt': record.get('excerpt') or make_excerpt(content),
+        'author_id': author_id,
+        'status': status,
+        'views': 0,
+        'likes_count': 0,
+        'created_at': created_at,
+        'updated_at': created_at,
+    }, tags
+
+
+def _validate_like(record, user_ids, existing_ids, article_ids, refs):
+    """校验一条点赞记录并返回待插入的行，数据有误时抛出 ValueError
+
+    文章用 article_id（已有文章）或 article（本次导入中更早出现的文章的 ref）指定
+    """
+    user_id = _user_id(record, 'user_id', 'user', user_ids, existing_ids, '用户')
+    article_id = record.get('article_id')
+    if article_id is not None:
+        if not isinstance(article_id, int) or article_id not in article_ids:
+            raise ValueError(f'文章不存在: {article_id}')
+    elif 'article' in record:
+        article_id = refs.get(record['article']) if isinstance(record['article'], (str, int)) else None
+        if article_id is None:
+            raise ValueError(f'文章 ref 不存在: {record["article"]}')
+    else:
+        raise ValueError('缺少必填字段: article_id 或 article')
+    return {'user_id': user_id, 'article_id': article_id, 'created_at': _created_at(record)}
+
+
+def _import_chunk(chunk, report, refs):
+    """导入一批记录，整批在一个事务中提交；先写入文章，再写入点赞（点赞可引用本批的文章）"""
+    articles, likes = [], []
+    for lineno, record, error in chunk:
+        if error is None and record.get('type', 'article') not in RECORD_TYPES:
+            error = f'不支持的记录类型: {record.get("type")}'
+        if error is None and record.get('type') == 'like':
+            likes.append((lineno, record))
+        else:
+            articles.append((lineno, record, error))
+
+    published_per_day = _insert_articles(articles, report, refs)
+    likes_per_day = _insert_likes(likes, report, refs)
+    db.session.commit()
+
+    for day, count in published_per_day.items():
+        site_stats.record(articles=count, day=day)
+    for day, count in likes_per_day.items():
+        site_stats.record(likes=count, day=day)
+
+
+def _insert_articles(chunk, report, refs):
+    """校验并写入文章与文章-标签关联（不提交），返回每天新增的已发布文章数"""
+    author_ids, existing_ids = _resolve_users([record for _, record, _ in chunk if record], 'author_id', 'author')
+
+    rows, tag_lists, row_refs = [], [], []
+    for lineno, record, error in chunk:
+        try:
+            if error:
+                raise ValueError(error)
+            row, tags = _validate(record, author_ids, existing_ids, refs)
+        except ValueError as e:
+            _skip(report, lineno, str(e))
+            continue
+        rows.append(row)
+        tag_lists.append(tags)
+        row_refs.append(record.get('ref'))
+        if record.get('ref') is not None:
+            # 先占位，避免同一批中重复的 ref 通过校验
+            refs[record['ref']] = None
+
+    if not rows:
+        return {}
+
+    tag_ids, _ = resolve_tag_ids(tag for tags in tag_lists for tag in tags)
+    _insert_article_rows(rows)
+    links = []
+    counts = {}
+    now = datetime.utcnow()
+    for row, tags in zip(rows, tag_lists):
+        for tag_id in {tag_ids[tag.strip()] for tag in tags if tag.strip() in tag_ids}:
+            links.append({'article_id': row['id'], 'tag_id': tag_id, 'created_at': now})
+            if row['status'] == 'published':
+                counts[tag_id] = counts.get(tag_id, 0) + 1
+    if links:
+        db.session.execute(ArticleTag.__table__.insert(), links)
+    adjust_tag_counts(counts)
+    for row, ref in zip(rows, row_refs):
+        if ref is not None:
+            refs[ref] = row['id']
+
+    published_per_day = {}
+    for row in rows:
+        if row['status'] == 'published':
+            day = row['created_at'].date()
+            published_per_day[day] = published_per_day.get(day, 0) + 1
+
+    report['inserted'] += len(rows)
+    report['tag_links'] += len(links)
+    report['published'] += sum(1 for row in rows if row['status'] == 'published')
+    return published_per_day
+
+
+def _insert_article_rows(rows):
+    """用一条 executemany 插入文章，再一次读回自增 id 写入 rows（生成文章-标签关联、ref 需要）
+
+    bulk_insert_mappings(return_defaults=True) 会退化为逐行 INSERT，这里改为先记下插入前的最大 id，
+    插入后按 id 范围读回本事务新增的文章，按 (author_id, title) 与 rows 对应；同一个键的多行按插入顺序
+    对应（自增 id 随插入顺序递增），并发写入的其他文章键不同，不会被误认。
+    """
+    max_id = db.session.query(func.max(Article.id)).scalar() or 0
+    db.session.execute(Article.__table__.insert(), rows)
+    inserted = defaultdict(deque)
+    for article_id, author_id, title in db.session.query(Article.id, Article.author_id, Article.title)\
+            .filter(Article.id > max_id).order_by(Article.id):
+        inserted[(author_id, title)].append(article_id)
+    for row in rows:
+        row['id'] = inserted[(row['author_id'], row['title'])].popleft()
+
+
+def _insert_likes(chunk, report, refs):
+    """校验并写入点赞（不提交），同一事务中按文章增加点赞数，返回每天新增的点赞数
+
+    已存在的点赞与本批中重复的点赞作为错误跳过
+    """
+    if not chunk:
+        return {}
+    records = [record for _, record in chunk]
+    user_ids, existing_ids = _resolve_users(records, 'user_id', 'user')
+    requested_ids = {record['article_id'] for record in records if isinstance(record.get('article_id'), int)}
+    article_ids = {
+        article_id for article_id, in db.session.query(Article.id).filter(Article.id.in_(requested_ids)).all()
+    } if requested_ids else set()
+
+    rows = []
+    for lineno, record in chunk:
+        try:
+            rows.append((lineno, _validate_like(record, user_ids, existing_ids, article_ids, refs)))
+        except ValueError as e:
+            _skip(report, lineno, str(e))
+
+    existing = set(db.session.query(Like.user_id, Like.article_id).filter(
+        Like.user_id.in_({row['user_id'] for _, row in rows}),
+        Like.article_id.in_({row['article_id'] for _, row in rows})
+    ).all()) if rows else set()
+    new_rows = []
+    for lineno, row in rows:
+        key = (row['user_id'], row['article_id'])
+        if key in existing:
+            _skip(report, lineno, f'用户 {key[0]} 已点赞过文章 {key[1]}')
+            continue
+        existing.add(key)
+        new_rows.append(row)
+
+    if not new_rows:
+        return {}
+
+    db.session.execute(Like.__table__.insert(), new_rows)
+    deltas, likes_per_day = {}, {}
+    for row in new_rows:
+        deltas[row['article_id']] = deltas.get(row['article_id'], 0) + 1
+        day = row['created_at'].date()
+        likes_per_day[day] = likes_per_day.get(day, 0) + 1
+    adjust_likes_counts(deltas)
+
+    report['likes'] += len(new_rows)
+    return likes_per_day
+
+
+def import_articles(lines, chunk_size=1000):
+    """从 NDJSON 行导入文章与点赞（需在应用上下文中调用），返回导入报告"""
+    report = {'received': 0, 'inserted': 0, 'skipped': 0, 'published': 0, 'tag_links': 0, 'likes': 0, 'errors': []}
+    started = time.perf_counter()
+    records = parse_ndjson(lines)
+    refs = {}
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        report['received'] += len(chunk)
+        try:
+            _import_chunk(chunk, report, refs)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    elapsed = time.perf_counter() - started
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['articles_per_second'] = round(report['inserted'] / elapsed, 1) if elapsed else 0
+    return report
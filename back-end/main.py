@@ -1,56 +1,179 @@
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from config import SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS
-from models import db, User, Passage, Article, Tag, ArticleTag, Like
+from models import db, User, Passage, Article, Tag, ArticleTag, Like, serialize_articles, \
+    parse_article_fields, article_load_options, liked_article_ids, make_excerpt, check_tag_names, \
+    resolve_tag_ids, article_tag_ids, adjust_tag_counts
+from view_counter import view_counter
+from tasks import scheduler, reconcile_likes_count, rebuild_tag_counts
+from cache import response_cache
+from pagination import keyset_paginate, cursor_meta
+from migrations import upgrade
+from ranking import hot_ranking, WINDOWS
+from search import article_search, highlight
+from passwords import password_hasher, PasswordHasherBusy
+from auth import token_auth, login_required, admin_required, is_admin, current_user
+from export import export_rows, EXPORT_FORMATS, USER_EXPORT_COLUMNS, ARTICLE_EXPORT_COLUMNS
+from ingest import import_articles
+from stats import site_stats
+from request_log import request_log
+from metrics import metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from profiler import sql_profiler
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
+from functools import wraps
+import click
+import json
+import logging
 import re
 
-app = Flask(__name__)
-CORS(app)  # 开启跨域支持
+api = Blueprint('api', __name__, cli_group=None)
+logger = logging.getLogger('blog.api')
 
-app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
-db.init_app(app)
+# 周期维护任务，间隔从对应的配置项读取
+scheduler.add_job('reconcile-likes', reconcile_likes_count, 'LIKES_RECONCILE_INTERVAL')
+scheduler.add_job('rebuild-hot-ranking', hot_ranking.rebuild, 'HOT_RANK_REBUILD_INTERVAL')
+scheduler.add_job('refresh-search-index', article_search.refresh, 'SEARCH_INDEX_REFRESH_INTERVAL')
+scheduler.add_job('flush-site-stats', site_stats.flush, 'STATS_FLUSH_INTERVAL')
+scheduler.add_job('reconcile-site-stats', site_stats.reconcile, 'STATS_RECONCILE_INTERVAL')
+scheduler.add_job('write-metrics', metrics.write_snapshot, 'METRICS_WRITE_INTERVAL')
 
-# 确保启动时已创建所有表，避免因未初始化导致的 500
-with app.app_context():
-    try:
-        db.create_all()
-        print("[startup] 数据表检查/创建完成")
-    except Exception as e:
-        # 可能是 MySQL 未启动/库不存在等原因，降级为本地 SQLite，保证开发环境可运行
-        print(f"[startup] 初始化数据库失败，尝试切换到SQLite: {e}")
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-        # 重新关联配置
-        db.init_app(app)
-        db.create_all()
-        print("[startup] 已切换到 SQLite 并创建数据表 app.db")
+def create_app(config=None):
+    """创建应用实例
+
+    默认配置来自 config.py，config 可以是 dict 或配置对象，用于覆盖其中的配置项。
+    创建过程不连接数据库：表结构由 `flask db-upgrade` 显式升级，
+    热门排行、搜索索引在第一次使用时构建，后台线程在第一次请求时启动，
+    这样 gunicorn 预加载后 fork 出的每个 worker 都能很快就绪。
+    """
+    app = Flask(__name__)
+    CORS(app)  # 开启跨域支持
+
+    app.config.from_object('config')
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # 开发用密钥是公开的，用它签名等于任何人都能伪造管理员令牌，只允许在调试、测试模式下使用
+    if not app.config.get('SECRET_KEY'):
+        if not (app.debug or app.testing):
+            raise RuntimeError('未设置 SECRET_KEY：请通过环境变量设置访问令牌的签名密钥（本地开发可设置 FLASK_DEBUG=1）')
+        app.config['SECRET_KEY'] = app.config['DEV_SECRET_KEY']
+
+    request_log.init_app(app)
+    metrics.init_app(app)
+    sql_profiler.init_app(app)
+    db.init_app(app)
+    view_counter.init_app(app)
+    response_cache.init_app(app)
+    hot_ranking.init_app(app)
+    article_search.init_app(app)
+    password_hasher.init_app(app)
+    token_auth.init_app(app)
+    site_stats.init_app(app)
+    scheduler.init_app(app)
+
+    app.register_blueprint(api)
+    return app
+
+@api.cli.command('db-upgrade')
+def db_upgrade_command():
+    """执行所有未执行的数据库迁移"""
+    # 逐个版本的进度由 upgrade() 写入 blog.migrations 日志，这里只输出汇总
+    applied = upgrade()
+    click.echo(f"已执行迁移: {applied}" if applied else "数据库结构已是最新版本")
+
+@api.cli.command('rebuild-tag-counts')
+def rebuild_tag_counts_command():
+    """按 article_tags 重算所有标签的已发布文章数"""
+    fixed = rebuild_tag_counts()
+    response_cache.invalidate('tags')
+    print(f"已修正 {fixed} 个标签的文章数")
+
+@api.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """按明细表重算全站统计与全部日期的按天统计"""
+    site_stats.reconcile(full=True)
+    response_cache.invalidate('stats')
+    print(f"已重算全站统计: {site_stats.totals()}")
+
+@api.cli.command('import-articles')
+@click.argument('source', type=click.File('rb'))
+@click.option('--chunk-size', default=1000, show_default=True, help='每个事务导入的文章数')
+def import_articles_command(source, chunk_size):
+    """从 NDJSON 文件批量导入文章与点赞（SOURCE 为 - 时读取标准输入）"""
+    report = run_article_import(source, chunk_size)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+@api.cli.command('reconcile-likes')
+def reconcile_likes_command():
+    """按 likes 表重算所有文章的点赞数"""
+    fixed = reconcile_likes_count()
+    print(f"已修正 {fixed} 篇文章的点赞数")
+
+def internal_only(view):
+    """内部接口：只允许 INTERNAL_ALLOWED_IPS 中的地址访问"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.remote_addr not in current_app.config['INTERNAL_ALLOWED_IPS']:
+            return jsonify({'error': '无权访问'}), 403
+        return view(*args, **kwargs)
+    return wrapper
 
 # 错误处理
-@app.errorhandler(400)
+@api.app_errorhandler(400)
 def bad_request(error):
     return jsonify({'error': 'Bad Request', 'message': '请求参数错误'}), 400
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not Found', 'message': '资源不存在'}), 404
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal Server Error', 'message': '服务器内部错误'}), 500
 
 # 用户相关API
-@app.route('/api/users', methods=['GET'])
+@api.route('/api/users', methods=['GET'])
 def get_users():
     """获取所有用户列表"""
     try:
-        users = User.query.all()
+        # 传入 page 或 cursor 时分页返回；不传时保持原来的数组格式（用户管理页面使用）
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+        query = User.query
+        
+        if 'cursor' in request.args:
+            try:
+                items, next_cursor = keyset_paginate(
+                    query, User.created_at, User.id, request.args.get('cursor'), per_page
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'users': [user.to_dict() for user in items],
+                **cursor_meta(query, next_cursor, request.args.get('with_total', type=int))
+            })
+        
+        if 'page' in request.args:
+            page = request.args.get('page', 1, type=int)
+            users = query.order_by(User.created_at.desc(), User.id.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+            return jsonify({
+                'users': [user.to_dict() for user in users.items],
+                'total': users.total,
+                'pages': users.pages,
+                'current_page': page
+            })
+        
+        users = query.all()
         return jsonify([user.to_dict() for user in users])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<int:user_id>', methods=['GET'])
+@api.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     """获取单个用户信息"""
     try:
@@ -61,7 +184,7 @@ def get_user(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register():
     """用户注册"""
     try:
@@ -107,18 +230,23 @@ def register():
         
         db.session.add(user)
         db.session.commit()
+        site_stats.record(users=1)
+        response_cache.invalidate('stats')
         
         return jsonify({
             'message': '注册成功',
             'user': user.to_dict()
         }), 201
         
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db.session.rollback()
-        print(f"注册异常: {str(e)}")
+        logger.exception('注册失败')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     """用户登录"""
     try:
@@ -139,10 +267,16 @@ def login():
             user = User.query.filter_by(username=username).first()
         
         if user and user.check_password(password):
+            if user.password_needs_rehash():
+                # 哈希参数已调整，用这次登录的明文密码按新参数重新哈希
+                user.set_password(password)
+                db.session.commit()
             return jsonify({
                 'code': 200,
                 'message': '登录成功',
-                'user': user.to_dict()
+                'user': user.to_dict(),
+                'token': token_auth.issue(user),
+                'expires_in': token_auth.max_age
             })
         else:
             return jsonify({
@@ -150,14 +284,30 @@ def login():
                 'message': '用户名或密码错误'
             }), 401
             
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
-        print(f"登录异常: {str(e)}")
+        db.session.rollback()
+        logger.exception('登录失败')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<int:user_id>', methods=['PUT'])
+@api.route('/api/me', methods=['GET'])
+@login_required
+def get_current_user():
+    """获取当前登录用户的信息"""
+    user = current_user()
+    if not user:
+        return jsonify({'error': '用户不存在'}), 404
+    return jsonify(user)
+
+@api.route('/api/users/<int:user_id>', methods=['PUT'])
+@login_required
 def update_user(user_id):
-    """更新用户信息"""
+    """更新用户信息（本人或管理员）"""
     try:
+        if g.user_id != user_id and not is_admin():
+            return jsonify({'error': '无权修改其他用户的信息'}), 403
+        
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': '用户不存在'}), 404
@@ -221,42 +371,65 @@ def update_user(user_id):
             user.real_name = data['real_name']
 
         db.session.commit()
+        response_cache.invalidate('articles')
+        token_auth.forget_user(user_id)
         return jsonify({'message': '更新成功', 'user': user.to_dict()})
         
     except Exception as e:
         db.session.rollback()
-        import traceback
-        print('[update_user] 发生异常:', e)
-        print(traceback.format_exc())
+        logger.exception('更新用户 %s 失败', user_id)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@api.route('/api/users/<int:user_id>', methods=['DELETE'])
+@admin_required
 def delete_user(user_id):
-    """删除用户"""
+    """删除用户（管理员）"""
     try:
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': '用户不存在'}), 404
         
+        created_day = user.created_at.date() if user.created_at else None
         db.session.delete(user)
         db.session.commit()
+        site_stats.record(users=-1, day=created_day)
+        response_cache.invalidate('articles', 'stats')
+        token_auth.forget_user(user_id)
         return jsonify({'message': f'用户 {user_id} 删除成功'})
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def annotate_is_liked(articles, items, viewer_id):
+    """传入 viewer_id 时为每篇文章附加 is_liked，整页只用一次查询
+
+    文章 id 取自 ORM 对象而不是序列化结果，?fields= 中不含 id 时同样可用
+    """
+    if viewer_id:
+        liked = liked_article_ids(viewer_id, [article.id for article in articles])
+        for article, item in zip(articles, items):
+            item['is_liked'] = article.id in liked
+    return items
+
 # 文章相关API
-@app.route('/api/articles', methods=['GET'])
+@api.route('/api/articles', methods=['GET'])
+@response_cache.cached('articles')
 def get_articles():
     """获取文章列表"""
     try:
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        per_page = max(1, min(request.args.get('per_page', 10, type=int), 100))
         tag = request.args.get('tag')
         author = request.args.get('author')
+        viewer_id = request.args.get('viewer_id', type=int)
+        try:
+            fields = parse_article_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        query = Article.query.filter_by(status='published')
+        # 列表默认不返回正文（?fields=detail 可取回），此时 content 列不参与查询
+        query = Article.query.options(*article_load_options(fields)).filter_by(status='published')
         
         if tag:
             query = query.join(ArticleTag).join(Tag).filter(Tag.name == tag)
@@ -264,12 +437,25 @@ def get_articles():
         if author:
             query = query.join(User).filter(User.username == author)
         
+        # 游标分页（?cursor=，为空表示第一页）：按索引定位，不统计总数，除非 with_total=1
+        if 'cursor' in request.args:
+            try:
+                items, next_cursor = keyset_paginate(
+                    query, Article.created_at, Article.id, request.args.get('cursor'), per_page
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'articles': annotate_is_liked(items, serialize_articles(items, fields), viewer_id),
+                **cursor_meta(query, next_cursor, request.args.get('with_total', type=int))
+            })
+        
         articles = query.order_by(Article.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
         
         return jsonify({
-            'articles': [article.to_dict() for article in articles.items],
+            'articles': annotate_is_liked(articles.items, serialize_articles(articles.items, fields), viewer_id),
             'total': articles.total,
             'pages': articles.pages,
             'current_page': page
@@ -278,7 +464,40 @@ def get_articles():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/articles/<int:article_id>', methods=['GET'])
+@api.route('/api/articles/search', methods=['GET'])
+def search_articles():
+    """全文搜索文章（按相关度排序，返回标题与摘要中的高亮片段）"""
+    try:
+        q = (request.args.get('q') or '').strip()
+        limit = request.args.get('limit', 20, type=int)
+        if not q:
+            return jsonify({'error': '搜索关键词不能为空'}), 400
+        try:
+            fields = parse_article_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        total, hits = article_search.search(q, max(1, min(limit, 100)))
+        scores = dict(hits)
+        articles = Article.query.options(*article_load_options(fields)).filter(
+            Article.id.in_(scores), Article.status == 'published'
+        ).all() if hits else []
+        position = {article_id: i for i, (article_id, _) in enumerate(hits)}
+        articles.sort(key=lambda a: position[a.id])
+        
+        data = serialize_articles(articles, fields)
+        for article, item in zip(articles, data):
+            item['score'] = scores[article.id]
+            item['highlight'] = {
+                'title': highlight(article.title, q),
+                'excerpt': highlight(article.excerpt, q)
+            }
+        return jsonify({'articles': data, 'total': total})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/articles/<int:article_id>', methods=['GET'])
 def get_article(article_id):
     """获取单篇文章详情"""
     try:
@@ -286,93 +505,173 @@ def get_article(article_id):
         if not article:
             return jsonify({'error': '文章不存在'}), 404
         
-        # 增加浏览量
-        article.views += 1
-        db.session.commit()
+        # 增加浏览量：先计入缓冲，由后台批量写回，读请求不再单独提交事务
+        view_counter.incr(article_id)
+        site_stats.record(views=1)
+        hot_ranking.update(article_id, views_delta=1)
         
-        return jsonify(article.to_dict())
+        data = article.to_dict()
+        data['views'] = (article.views or 0) + view_counter.pending(article_id)
+        return jsonify(data)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/articles', methods=['POST'])
+@api.route('/api/articles', methods=['POST'])
+@login_required
 def create_article():
-    """创建新文章"""
+    """创建新文章，作者默认为当前登录用户"""
     try:
         data = request.json
-        required_fields = ['title', 'content', 'author_id']
+        required_fields = ['title', 'content']
         
         for field in required_fields:
             if not data.get(field):
                 return jsonify({'error': f'缺少必填字段: {field}'}), 400
         
+        author_id = data.get('author_id') or g.user_id
+        if author_id != g.user_id and not is_admin():
+            return jsonify({'error': '不能以其他用户的身份发布文章'}), 403
+        try:
+            tag_names = check_tag_names(data.get('tags'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # 生成摘要
-        excerpt = data['content'][:200] + '...' if len(data['content']) > 200 else data['content']
+        excerpt = make_excerpt(data['content'])
         
         article = Article(
             title=data['title'],
             content=data['content'],
             excerpt=excerpt,
-            author_id=data['author_id'],
+            author_id=author_id,
             status=data.get('status', 'published')
         )
         
         db.session.add(article)
         db.session.flush()  # 获取article.id
         
-        # 处理标签
-        if 'tags' in data and data['tags']:
-            for tag_name in data['tags']:
-                tag = Tag.query.filter_by(name=tag_name).first()
-                if not tag:
-                    tag = Tag(name=tag_name)
-                    db.session.add(tag)
-                    db.session.flush()
-                
-                article_tag = ArticleTag(article_id=article.id, tag_id=tag.id)
-                db.session.add(article_tag)
+        # 处理标签：所有标签名一次解析，缺少的标签批量创建
+        tag_ids = set(resolve_tag_ids(tag_names)[0].values())
+        db.session.add_all(ArticleTag(article_id=article.id, tag_id=tag_id) for tag_id in tag_ids)
+        if article.status == 'published':
+            adjust_tag_counts({tag_id: 1 for tag_id in tag_ids})
         
         db.session.commit()
+        if article.status == 'published':
+            site_stats.record(articles=1)
+        response_cache.invalidate('articles', 'tags', 'stats')
+        if article.status == 'published':
+            hot_ranking.upsert(article.id, article.created_at, 0, 0)
+        article_search.add(article)
         return jsonify({'message': '文章创建成功', 'article': article.to_dict()}), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/articles/<int:article_id>', methods=['PUT'])
+@api.route('/api/articles/<int:article_id>', methods=['PUT'])
+@login_required
 def update_article(article_id):
-    """更新文章"""
+    """更新文章（作者本人或管理员）"""
     try:
         article = Article.query.get(article_id)
         if not article:
             return jsonify({'error': '文章不存在'}), 404
+        if article.author_id != g.user_id and not is_admin():
+            return jsonify({'error': '无权修改其他用户的文章'}), 403
         
         data = request.json
+        if 'tags' in data:
+            try:
+                tag_names = check_tag_names(data['tags'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        was_published = article.status == 'published'
         if 'title' in data:
             article.title = data['title']
         if 'content' in data:
             article.content = data['content']
-            article.excerpt = data['content'][:200] + '...' if len(data['content']) > 200 else data['content']
+            article.excerpt = make_excerpt(data['content'])
         if 'status' in data:
             article.status = data['status']
         
+        # 标签按差异更新：只插入新增的关联、只删除被移除的关联，保留浏览量与点赞
+        old_tag_ids = set(article_tag_ids(article.id))
+        new_tag_ids = old_tag_ids
+        created_tags = []
+        if 'tags' in data:
+            new_tag_ids, created_tags = resolve_tag_ids(tag_names)
+            new_tag_ids = set(new_tag_ids.values())
+            removed = old_tag_ids - new_tag_ids
+            added = new_tag_ids - old_tag_ids
+            if removed:
+                ArticleTag.query.filter(ArticleTag.article_id == article.id, ArticleTag.tag_id.in_(removed))\
+                    .delete(synchronize_session=False)
+            if added:
+                now = datetime.utcnow()
+                db.session.execute(ArticleTag.__table__.insert(), [
+                    {'article_id': article.id, 'tag_id': tag_id, 'created_at': now} for tag_id in sorted(added)
+                ])
+        
+        # 标签的已发布文章数随发布状态与标签变化在同一事务中增减
+        is_published = article.status == 'published'
+        deltas = {}
+        for tag_id in old_tag_ids if was_published else ():
+            deltas[tag_id] = deltas.get(tag_id, 0) - 1
+        for tag_id in new_tag_ids if is_published else ():
+            deltas[tag_id] = deltas.get(tag_id, 0) + 1
+        deltas = {tag_id: delta for tag_id, delta in deltas.items() if delta}
+        adjust_tag_counts(deltas)
+        
         db.session.commit()
+        if was_published != is_published:
+            site_stats.record(articles=1 if is_published else -1, day=article.created_at.date())
+        # 只有新建了标签或标签的文章数变化时才让标签相关的缓存失效（草稿也可能新建标签）
+        response_cache.invalidate('articles', 'stats', *(['tags'] if deltas or created_tags else []))
+        if article.status == 'published':
+            hot_ranking.upsert(
+                article.id, article.created_at,
+                (article.views or 0) + view_counter.pending(article.id), article.likes_count
+            )
+        else:
+            hot_ranking.remove(article.id)
+        article_search.add(article)
         return jsonify({'message': '更新成功', 'article': article.to_dict()})
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/articles/<int:article_id>', methods=['DELETE'])
+@api.route('/api/articles/<int:article_id>', methods=['DELETE'])
+@login_required
 def delete_article(article_id):
-    """删除文章"""
+    """删除文章（作者本人或管理员）"""
     try:
         article = Article.query.get(article_id)
         if not article:
             return jsonify({'error': '文章不存在'}), 404
-        
+        if article.author_id != g.user_id and not is_admin():
+            return jsonify({'error': '无权删除其他用户的文章'}), 403
+        
+        # 关联的标签与点赞一并删除，已发布文章的标签文章数在同一事务中减一
+        tag_ids = article_tag_ids(article_id)
+        if article.status == 'published':
+            adjust_tag_counts({tag_id: -1 for tag_id in tag_ids})
+        ArticleTag.query.filter_by(article_id=article_id).delete(synchronize_session=False)
+        Like.query.filter_by(article_id=article_id).delete(synchronize_session=False)
+        was_published = article.status == 'published'
+        created_day = article.created_at.date() if article.created_at else None
+        views, likes_count = article.views or 0, article.likes_count or 0
         db.session.delete(article)
         db.session.commit()
+        if was_published:
+            site_stats.record(articles=-1, day=created_day)
+        # 总浏览量与总点赞数按所有文章求和，删除文章时一并扣除（不计入按天统计）
+        site_stats.record(views=-views, likes=-likes_count, daily=False)
+        response_cache.invalidate('articles', 'tags', 'stats')
+        hot_ranking.remove(article_id)
+        article_search.remove(article_id)
         return jsonify({'message': '文章删除成功'})
         
     except Exception as e:
@@ -380,31 +679,66 @@ def delete_article(article_id):
         return jsonify({'error': str(e)}), 500
 
 # 热门文章API
-@app.route('/api/articles/hot', methods=['GET'])
+@api.route('/api/articles/hot', methods=['GET'])
+@response_cache.cached('articles')
 def get_hot_articles():
-    """获取热门文章"""
+    """获取热门文章（按时间衰减后的热度排序，?window=24h/7d/all）"""
     try:
         limit = request.args.get('limit', 10, type=int)
-        articles = Article.query.filter_by(status='published')\
-            .order_by(Article.views.desc(), Article.likes_count.desc())\
-            .limit(limit).all()
-        
-        return jsonify([article.to_dict() for article in articles])
+        window = request.args.get('window', 'all')
+        if window not in WINDOWS:
+            return jsonify({'error': f'window 只能是: {", ".join(WINDOWS)}'}), 400
+        try:
+            fields = parse_article_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 排行在内存中维护，这里只取前 limit 篇，再按 id 批量加载。其他 worker 中下线或删除的文章
+        # 要到下次重建排行时才会从本进程的排行中移除，加载时按状态过滤，不返回草稿
+        article_ids = hot_ranking.top(limit, window)
+        articles = Article.query.options(*article_load_options(fields))\
+            .filter(Article.id.in_(article_ids), Article.status == 'published').all() if article_ids else []
+        position = {article_id: i for i, article_id in enumerate(article_ids)}
+        articles.sort(key=lambda a: position[a.id])
+        
+        # 合并尚未写回的浏览量
+        data = serialize_articles(articles, fields)
+        if 'views' in fields:
+            for article, item in zip(articles, data):
+                item['views'] = (item['views'] or 0) + view_counter.pending(article.id)
+        return jsonify(annotate_is_liked(articles, data, request.args.get('viewer_id', type=int)))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # 标签相关API
-@app.route('/api/tags', methods=['GET'])
+@api.route('/api/tags', methods=['GET'])
+@response_cache.cached('tags')
 def get_tags():
-    """获取所有标签"""
+    """获取所有标签，?with_counts=1 时附带已发布文章数"""
     try:
+        with_counts = request.args.get('with_counts', type=int)
         tags = Tag.query.all()
-        return jsonify([tag.to_dict() for tag in tags])
+        return jsonify([tag.to_dict(with_count=with_counts) for tag in tags])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/tags', methods=['POST'])
+@api.route('/api/tags/popular', methods=['GET'])
+@response_cache.cached('tags')
+def get_popular_tags():
+    """获取已发布文章数最多的标签"""
+    try:
+        limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+        tags = Tag.query.filter(Tag.published_count > 0)\
+            .order_by(Tag.published_count.desc(), Tag.id)\
+            .limit(limit)\
+            .all()
+        return jsonify([tag.to_dict(with_count=True) for tag in tags])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/tags', methods=['POST'])
+@login_required
 def create_tag():
     """创建新标签"""
     try:
@@ -423,6 +757,7 @@ def create_tag():
         
         db.session.add(tag)
         db.session.commit()
+        response_cache.invalidate('tags')
         
         return jsonify({'message': '标签创建成功', 'tag': tag.to_dict()}), 201
         
@@ -431,108 +766,153 @@ def create_tag():
         return jsonify({'error': str(e)}), 500
 
 # 点赞相关API
-@app.route('/api/articles/<int:article_id>/like', methods=['POST'])
+@api.route('/api/articles/<int:article_id>/like', methods=['POST'])
+@login_required
 def like_article(article_id):
-    """点赞文章"""
+    """点赞文章（当前登录用户）"""
     try:
-        data = request.json
-        user_id = data.get('user_id')
-        
-        print(f"点赞请求: 文章ID={article_id}, 用户ID={user_id}")
+        data = request.get_json(silent=True) or {}
+        user_id = g.user_id
         
-        if not user_id:
-            return jsonify({'error': '用户ID不能为空'}), 400
+        if data.get('user_id') and data['user_id'] != user_id:
+            return jsonify({'error': '不能以其他用户的身份点赞'}), 403
         
-        article = Article.query.get(article_id)
-        if not article:
+        if not db.session.query(Article.id).filter_by(id=article_id).first():
             return jsonify({'error': '文章不存在'}), 404
         
-        print(f"文章信息: ID={article.id}, 标题={article.title}, 当前点赞数={article.likes_count}")
-        
-        # 检查是否已经点赞
-        existing_like = Like.query.filter_by(user_id=user_id, article_id=article_id).first()
+        # 切换操作全部交给数据库原子完成：先尝试删除点赞记录，删除成功说明原来已点赞；
+        # 否则插入，唯一约束冲突说明并发请求已插入。计数只在记录确实变化时用 SQL 表达式增减，
+        # 避免读出-修改-写回造成的丢失更新
+        deleted = Like.query.filter_by(user_id=user_id, article_id=article_id)\
+            .delete(synchronize_session=False)
         
-        if existing_like:
+        if deleted:
             # 取消点赞
-            print(f"用户{user_id}已点赞文章{article_id}，执行取消点赞")
-            db.session.delete(existing_like)
-            article.likes_count = max(0, article.likes_count - 1)
+            Article.query.filter(Article.id == article_id, Article.likes_count > 0)\
+                .update({Article.likes_count: Article.likes_count - 1}, synchronize_session=False)
+            likes_delta = -1
             message = '取消点赞成功'
             is_liked = False
         else:
             # 添加点赞
-            print(f"用户{user_id}未点赞文章{article_id}，执行添加点赞")
-            like = Like(user_id=user_id, article_id=article_id)
-            db.session.add(like)
-            article.likes_count += 1
+            try:
+                db.session.add(Like(user_id=user_id, article_id=article_id))
+                db.session.flush()
+                Article.query.filter(Article.id == article_id)\
+                    .update({Article.likes_count: Article.likes_count + 1}, synchronize_session=False)
+                likes_delta = 1
+            except IntegrityError:
+                db.session.rollback()
+                # 不是重复点赞（例如用户不存在）则按异常处理
+                if not Like.query.filter_by(user_id=user_id, article_id=article_id).first():
+                    raise
+                logger.debug('用户 %s 对文章 %s 的点赞已由并发请求写入', user_id, article_id)
+                likes_delta = 0
             message = '点赞成功'
             is_liked = True
         
-        print(f"更新后点赞数: {article.likes_count}")
         db.session.commit()
+        site_stats.record(likes=likes_delta)
+        response_cache.invalidate('articles', 'stats')
+        hot_ranking.update(article_id, likes_delta=likes_delta)
+        likes_count = db.session.query(Article.likes_count).filter_by(id=article_id).scalar()
+        logger.debug('用户 %s %s文章 %s，点赞数 %s', user_id, '点赞' if is_liked else '取消点赞',
+                     article_id, likes_count)
         
-        response_data = {
+        return jsonify({
             'message': message,
-            'likes_count': article.likes_count,
+            'likes_count': likes_count,
             'is_liked': is_liked
-        }
-        print(f"返回响应: {response_data}")
-        
-        return jsonify(response_data)
+        })
         
     except Exception as e:
         db.session.rollback()
-        print(f"点赞操作异常: {str(e)}")
+        logger.exception('点赞文章 %s 失败', article_id)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/articles/<int:article_id>/like', methods=['GET'])
+@api.route('/api/articles/<int:article_id>/like', methods=['GET'])
 def check_like_status(article_id):
     """检查用户是否已点赞文章"""
     try:
         user_id = request.args.get('user_id', type=int)
-        print(f"检查点赞状态: 文章ID={article_id}, 用户ID={user_id}")
         
         if not user_id:
             return jsonify({'error': '用户ID不能为空'}), 400
         
         like = Like.query.filter_by(user_id=user_id, article_id=article_id).first()
         is_liked = bool(like)
-        print(f"用户{user_id}对文章{article_id}的点赞状态: {is_liked}")
+        logger.debug('用户 %s 对文章 %s 的点赞状态: %s', user_id, article_id, is_liked)
         
         return jsonify({'is_liked': is_liked})
         
     except Exception as e:
-        print(f"检查点赞状态异常: {str(e)}")
+        logger.exception('检查文章 %s 的点赞状态失败', article_id)
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/likes/status', methods=['POST'])
+def batch_like_status():
+    """批量检查用户对多篇文章的点赞状态"""
+    try:
+        data = request.json or {}
+        user_id = data.get('user_id')
+        article_ids = data.get('article_ids')
+        
+        if not user_id:
+            return jsonify({'error': '用户ID不能为空'}), 400
+        if not isinstance(article_ids, list) or not all(isinstance(i, int) for i in article_ids):
+            return jsonify({'error': 'article_ids 应为文章ID列表'}), 400
+        if len(article_ids) > 200:
+            return jsonify({'error': '一次最多查询200篇文章'}), 400
+        
+        liked = liked_article_ids(user_id, article_ids)
+        return jsonify({'statuses': {str(article_id): article_id in liked for article_id in article_ids}})
+        
+    except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # 用户个人内容API
-@app.route('/api/users/<int:user_id>/likes', methods=['GET'])
+@api.route('/api/users/<int:user_id>/likes', methods=['GET'])
 def get_user_likes(user_id):
     """获取用户点赞的文章列表"""
     try:
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        per_page = max(1, min(request.args.get('per_page', 10, type=int), 100))
         
-        print(f"获取用户{user_id}的点赞文章: 页码={page}, 每页={per_page}")
+        try:
+            fields = parse_article_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        # 先查询该用户的点赞记录，按时间倒序
-        likes_query = Like.query.filter_by(user_id=user_id).order_by(Like.created_at.desc())
-        likes_page = likes_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        print(f"找到{likes_page.total}条点赞记录")
+        # 点赞记录与文章一次联表查询，先过滤掉未发布的文章再分页，保证每页条数与 total 准确
+        # （行中 created_at / id 两列取自 Like，供游标分页使用）
+        likes_query = db.session.query(Article, Like.created_at, Like.id)\
+            .join(Like, Like.article_id == Article.id)\
+            .options(*article_load_options(fields))\
+            .filter(Like.user_id == user_id, Article.status == 'published')
+        if 'cursor' in request.args:
+            try:
+                rows, next_cursor = keyset_paginate(
+                    likes_query, Like.created_at, Like.id, request.args.get('cursor'), per_page
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            likes_page = None
+        else:
+            likes_page = likes_query.order_by(Like.created_at.desc(), Like.id.desc())\
+                .paginate(page=page, per_page=per_page, error_out=False)
+            rows = likes_page.items
 
-        # 收集对应文章
-        liked_articles = []
-        for like in likes_page.items:
-            article = Article.query.get(like.article_id)
-            if article and article.status == 'published':
-                liked_articles.append(article.to_dict())
-                print(f"添加点赞文章: ID={article.id}, 标题={article.title}")
-            else:
-                print(f"跳过无效文章: article_id={like.article_id}, status={article.status if article else 'None'}")
+        liked_articles = serialize_articles([row[0] for row in rows], fields)
+        for item, row in zip(liked_articles, rows):
+            item['liked_at'] = row[1].strftime('%Y-%m-%d %H:%M:%S') if row[1] else None
 
-        print(f"返回{len(liked_articles)}篇点赞文章")
+        logger.debug('用户 %s 的点赞文章: 本页 %s 篇', user_id, len(liked_articles))
         
+        if likes_page is None:
+            return jsonify({
+                'articles': liked_articles,
+                **cursor_meta(likes_query, next_cursor, request.args.get('with_total', type=int))
+            })
         return jsonify({
             'articles': liked_articles,
             'total': likes_page.total,
@@ -540,23 +920,40 @@ def get_user_likes(user_id):
             'current_page': page
         })
     except Exception as e:
-        print(f"获取用户点赞文章异常: {str(e)}")
+        logger.exception('获取用户 %s 的点赞文章失败', user_id)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<int:user_id>/articles', methods=['GET'])
+@api.route('/api/users/<int:user_id>/articles', methods=['GET'])
 def get_user_articles(user_id):
     """获取用户自己发布的文章列表"""
     try:
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        per_page = max(1, min(request.args.get('per_page', 10, type=int), 100))
+        try:
+            fields = parse_article_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        query = Article.query.options(*article_load_options(fields))\
+            .filter_by(status='published', author_id=user_id)
+        if 'cursor' in request.args:
+            try:
+                items, next_cursor = keyset_paginate(
+                    query, Article.created_at, Article.id, request.args.get('cursor'), per_page
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'articles': serialize_articles(items, fields),
+                **cursor_meta(query, next_cursor, request.args.get('with_total', type=int))
+            })
 
-        query = Article.query.filter_by(status='published', author_id=user_id)
         articles = query.order_by(Article.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
 
         return jsonify({
-            'articles': [article.to_dict() for article in articles.items],
+            'articles': serialize_articles(articles.items, fields),
             'total': articles.total,
             'pages': articles.pages,
             'current_page': page
@@ -565,67 +962,143 @@ def get_user_articles(user_id):
         return jsonify({'error': str(e)}), 500
 
 # 统计相关API
-@app.route('/api/stats', methods=['GET'])
+@api.route('/api/stats', methods=['GET'])
+@response_cache.cached('stats')
 def get_stats():
-    """获取网站统计信息"""
+    """获取网站统计信息（读取增量维护的汇总行，不扫描明细表）"""
     try:
-        total_users = User.query.count()
-        total_articles = Article.query.filter_by(status='published').count()
-        total_views = db.session.query(db.func.sum(Article.views)).scalar() or 0
-        total_likes = db.session.query(db.func.sum(Article.likes_count)).scalar() or 0
-        
-        return jsonify({
-            'total_users': total_users,
-            'total_articles': total_articles,
-            'total_views': total_views,
-            'total_likes': total_likes
-        })
-        
+        return jsonify(site_stats.totals())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/api/stats/daily', methods=['GET'])
+@response_cache.cached('stats')
+def get_daily_stats():
+    """获取最近若干天（?days=，默认 30，最多 365）每天的新用户、新文章、浏览量与点赞数"""
+    try:
+        days = max(1, min(request.args.get('days', 30, type=int), 365))
+        return jsonify(site_stats.daily(days))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """获取响应缓存的命中/未命中/淘汰计数"""
+    return jsonify(response_cache.stats())
+
+@api.route('/api/internal/pool', methods=['GET'])
+@internal_only
+def get_pool_stats():
+    """获取各数据库连接池的使用情况"""
+    stats = {}
+    for key, engine in db.engines.items():
+        pool = engine.pool
+        item = {'pool': type(pool).__name__, 'status': pool.status()}
+        if isinstance(pool, QueuePool):
+            item.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow()
+            })
+        stats[key or 'primary'] = item
+    return jsonify(stats)
+
+@api.route('/api/internal/password-hasher', methods=['GET'])
+@internal_only
+def get_password_hasher_stats():
+    """获取密码哈希线程池的排队、耗时与拒绝情况"""
+    return jsonify(password_hasher.stats())
+
+@api.route('/metrics', methods=['GET'])
+@internal_only
+def get_metrics():
+    """Prometheus 格式的运行指标"""
+    if not metrics.enabled:
+        return jsonify({'error': '指标未开启'}), 404
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+def export_response(name, columns):
+    """以分块响应流式导出整张表，?format=ndjson（默认）或 csv"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'不支持的导出格式: {fmt}'}), 400
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    rows = export_rows(columns, fmt, current_app.config['EXPORT_BATCH_SIZE'])
+    return Response(
+        stream_with_context(rows),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={name}.{extension}'}
+    )
+
+@api.route('/api/admin/export/users', methods=['GET'])
+@admin_required
+def export_users():
+    """导出全部用户（管理员）"""
+    return export_response('users', USER_EXPORT_COLUMNS)
+
+@api.route('/api/admin/export/articles', methods=['GET'])
+@admin_required
+def export_articles():
+    """导出全部文章（管理员）"""
+    return export_response('articles', ARTICLE_EXPORT_COLUMNS)
+
+def run_article_import(lines, chunk_size):
+    """批量导入文章与点赞，并让缓存、热门排行与搜索索引看到新数据"""
+    report = import_articles(lines, chunk_size)
+    if report['inserted'] or report['likes']:
+        response_cache.invalidate('articles', 'tags', 'stats')
+        hot_ranking.reset()
+    if report['inserted']:
+        article_search.refresh()
+    return report
+
+@api.route('/api/admin/import/articles', methods=['POST'])
+@admin_required
+def import_articles_api():
+    """批量导入文章与点赞（管理员），请求体为 NDJSON，每行一篇文章或一个点赞"""
+    try:
+        chunk_size = max(1, min(request.args.get('chunk_size', 1000, type=int), 5000))
+        report = run_article_import(request.stream, chunk_size)
+        return jsonify(report), 201 if report['inserted'] else 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 # 保留原有API以兼容现有前端
-@app.route('/api/addusers', methods=['POST'])
+@api.route('/api/addusers', methods=['POST'])
+@admin_required
 def add_user():
-    """添加用户（兼容旧版本）"""
+    """添加用户（兼容旧版本，仅管理员）"""
     try:
         data = request.json
-        print(f"接收到的数据: {data}")  # 调试信息
         
         if not data:
-            print("错误: 请求数据为空")
             return jsonify({'error': '请求数据为空'}), 400
         
         # 验证必填字段
         if not data.get('name'):
-            print("错误: 用户名为空")
             return jsonify({'error': '用户名不能为空'}), 400
         if not data.get('email'):
-            print("错误: 邮箱为空")
             return jsonify({'error': '邮箱不能为空'}), 400
         # 密码为可选，未提供则使用默认值
         provided_password = data.get('password', '').strip() if isinstance(data.get('password'), str) else ''
         
-        print(f"验证用户名: {data['name']}")
-        print(f"验证邮箱: {data['email']}")
-        
         # 检查用户名和邮箱是否已存在
         try:
             existing_user = User.query.filter_by(username=data['name']).first()
             if existing_user:
-                print(f"错误: 用户名 {data['name']} 已存在")
                 return jsonify({'error': '用户名已存在'}), 400
-        except Exception as e:
-            print(f"查询用户名时出错: {str(e)}")
+        except Exception:
+            logger.exception('查询用户名失败')
             return jsonify({'error': '数据库查询错误'}), 500
         
         try:
             existing_email = User.query.filter_by(email=data['email']).first()
             if existing_email:
-                print(f"错误: 邮箱 {data['email']} 已存在")
                 return jsonify({'error': '邮箱已存在'}), 400
-        except Exception as e:
-            print(f"查询邮箱时出错: {str(e)}")
+        except Exception:
+            logger.exception('查询邮箱失败')
             return jsonify({'error': '数据库查询错误'}), 500
         
         # 处理authority字段，确保是整数
@@ -635,13 +1108,9 @@ def add_user():
                 authority = int(data['authority'])
                 if authority not in [0, 1]:
                     authority = 0
-                print(f"权限设置为: {authority}")
-            except (ValueError, TypeError) as e:
-                print(f"权限转换错误: {str(e)}")
+            except (ValueError, TypeError):
                 authority = 0
         
-        print(f"创建用户: username={data['name']}, email={data['email']}, authority={authority}")
-        
         user = User(
             username=data['name'],
             email=data['email'],
@@ -654,35 +1123,39 @@ def add_user():
         
         db.session.add(user)
         db.session.commit()
+        site_stats.record(users=1)
+        response_cache.invalidate('stats')
+        logger.debug('添加用户 %s（id=%s, authority=%s）', user.username, user.id, authority)
         
-        print(f"用户创建成功: {user.username}")
         return jsonify({'message': '添加成功'})
         
     except Exception as e:
         db.session.rollback()
-        print(f"添加用户错误: {str(e)}")
-        print(f"错误类型: {type(e)}")
-        import traceback
-        print(f"错误堆栈: {traceback.format_exc()}")
+        logger.exception('添加用户失败')
         return jsonify({'error': f'添加用户失败: {str(e)}'}), 500
 
-@app.route('/api/deleteusers', methods=['POST'])
+@api.route('/api/deleteusers', methods=['POST'])
+@admin_required
 def delete_user_old():
-    """删除用户（兼容旧版本）"""
+    """删除用户（兼容旧版本，仅管理员）"""
     try:
         data = request.json
         user_id = data['id']
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': '没有该用户'}), 404
+        created_day = user.created_at.date() if user.created_at else None
         db.session.delete(user)
         db.session.commit()
+        site_stats.record(users=-1, day=created_day)
+        response_cache.invalidate('articles', 'stats')
+        token_auth.forget_user(user_id)
         return jsonify({'message': f'用户{user_id} 删除成功'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/passages', methods=['GET'])
+@api.route('/api/passages', methods=['GET'])
 def get_passages():
     """获取文章列表（兼容旧版本）"""
     try:
@@ -691,7 +1164,7 @@ def get_passages():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/getusers', methods=['GET', 'POST'])
+@api.route('/api/getusers', methods=['GET', 'POST'])
 def get_single_passage():
     """获取用户文章（兼容旧版本）"""
     try:
@@ -702,7 +1175,7 @@ def get_single_passage():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/add_passages', methods=['POST'])
+@api.route('/api/add_passages', methods=['POST'])
 def add_passages():
     """添加文章（兼容旧版本）"""
     try:
@@ -715,12 +1188,12 @@ def add_passages():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/')
+@api.route('/')
 def index():
     return "理想主义者后端API服务"
 
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
+    create_app({'DEBUG': True}).run(port=5000, debug=True)
 
 
 
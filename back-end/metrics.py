@@ -0,0 +1,359 @@
+# 运行指标
+# GET /metrics 以 Prometheus 文本格式输出：各接口的请求数、耗时直方图、进行中的请求数、
+# 各接口执行的 SQL 条数与耗时、数据库连接池使用情况、响应缓存命中率。
+# 记录指标时不加锁：每个线程在自己的分片（dict）上累加，输出时再汇总各分片，退出的线程的分片并入汇总。
+# 多进程（gunicorn 多个 worker）时配置 METRICS_MULTIPROC_DIR：每个进程每隔 METRICS_WRITE_INTERVAL
+# 秒把自己的快照写入该目录下的 <pid>.json，/metrics 汇总目录中的所有文件——计数与直方图累加
+# （包括已退出的进程，重启的 worker 不会让计数归零），仪表值只累加仍在运行的进程。服务启动前应清空该目录
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy.pool import QueuePool
+
+from models import db
+from cache import response_cache
+from request_log import request_log
+
+# 请求耗时直方图的桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger('blog.metrics')
+
+
+def _merge_value(target, key, value):
+    current = target.get(key)
+    if isinstance(value, list):
+        if current is None:
+            target[key] = list(value)
+        else:
+            for i, item in enumerate(value):
+                current[i] += item
+    else:
+        target[key] = (current or 0) + value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Metric:
+    """一个指标，kind 为 counter、gauge 或 histogram；标签值按 labelnames 的顺序传入"""
+
+    def __init__(self, registry, name, kind, documentation, labelnames=(), buckets=None):
+        self.registry = registry
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets) if buckets else None
+
+    def inc(self, *labelvalues, amount=1):
+        shard = self.registry.shard()
+        key = (self.name, labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def observe(self, value, *labelvalues):
+        shard = self.registry.shard()
+        key = (self.name, labelvalues)
+        counts = shard.get(key)
+        if counts is None:
+            # 各桶（最后一个为 +Inf）的计数，末尾为观测值之和；总数由各桶相加得到，始终与桶一致
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+class Registry:
+    """指标注册表：按线程分片累加，snapshot() 汇总"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._reset()
+        # fork 出的子进程从零开始计数，不继承父进程的分片
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards = []  # (线程, 分片)
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _add(self, name, kind, documentation, labelnames, buckets=None):
+        metric = Metric(self, name, kind, documentation, labelnames, buckets)
+        self.metrics[name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(name, 'counter', documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(name, 'gauge', documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(name, 'histogram', documentation, labelnames, buckets)
+
+    def shard(self):
+        """当前线程的分片"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def snapshot(self):
+        """汇总本进程的所有分片与 collectors 的当前值，返回 {指标名: {标签值元组: 值}}"""
+        merged = {}
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                # dict() 复制在持有 GIL 时一次完成，所属线程同时写入也不会出错
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                    source = merged
+                else:
+                    source = self._retired
+                for key, value in dict(shard).items():
+                    _merge_value(source, key, value)
+            self._shards = alive
+            for key, value in self._retired.items():
+                _merge_value(merged, key, value)
+
+        result = {}
+        for (name, labels), value in merged.items():
+            result.setdefault(name, {})[labels] = value
+        for collect in self.collectors:
+            for metric, labels, value in collect():
+                result.setdefault(metric.name, {})[tuple(labels)] = value
+        return result
+
+    def write(self, directory):
+        """把本进程的快照写入 directory/<pid>.json（先写临时文件再替换，读取方不会读到半个文件）"""
+        data = {
+            name: [[list(labels), value] for labels, value in values.items()]
+            for name, values in self.snapshot().items()
+        }
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(path, os.path.join(directory, f'{os.getpid()}.json'))
+
+    def aggregate(self, directory):
+        """汇总 directory 中各进程的快照，格式与 snapshot() 相同"""
+        result = {}
+        for filename in os.listdir(directory):
+            pid, ext = os.path.splitext(filename)
+            if ext != '.json' or not pid.isdigit():
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = None
+            for name, items in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                if metric.kind == 'gauge':
+                    if alive is None:
+                        alive = _pid_alive(int(pid))
+                    if not alive:
+                        continue
+                values = result.setdefault(name, {})
+                for labels, value in items:
+                    _merge_value(values, tuple(labels), value)
+        return result
+
+    def render(self, data):
+        """按 Prometheus 文本格式输出"""
+        lines = []
+        for metric in self.metrics.values():
+            values = data.get(metric.name, {})
+            if not values and metric.labelnames:
+                continue
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            if not values:
+                values = {(): [0] * (len(metric.buckets) + 2) if metric.kind == 'histogram' else 0}
+            for labels, value in sorted(values.items()):
+                if metric.kind != 'histogram':
+                    lines.append(f'{metric.name}{_label_text(metric.labelnames, labels)} {_format_number(value)}')
+                    continue
+                total = 0
+                for bound, count in zip(metric.buckets + (math.inf,), value):
+                    total += count
+                    label_text = _label_text(metric.labelnames + ('le',), labels + (_format_number(bound),))
+                    lines.append(f'{metric.name}_bucket{label_text} {total}')
+                label_text = _label_text(metric.labelnames, labels)
+                lines.append(f'{metric.name}_sum{label_text} {_format_number(float(value[-1]))}')
+                lines.append(f'{metric.name}_count{label_text} {total}')
+        lines.append('')
+        return '\n'.join(lines)
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', '按接口与状态码统计的请求数', ('method', 'route', 'status'))
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', '按接口统计的请求耗时（秒）', ('method', 'route'))
+IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', '正在处理的请求数', ('route',))
+DB_QUERIES = registry.counter(
+    'db_queries_total', '按接口统计的 SQL 执行条数', ('route',))
+DB_QUERY_SECONDS = registry.counter(
+    'db_query_duration_seconds_total', '按接口统计的 SQL 执行总耗时（秒）', ('route',))
+DB_POOL_SIZE = registry.gauge('db_pool_size', '连接池常驻连接数', ('engine',))
+DB_POOL_CHECKED_OUT = registry.gauge('db_pool_checked_out', '连接池中正在使用的连接数', ('engine',))
+DB_POOL_CHECKED_IN = registry.gauge('db_pool_checked_in', '连接池中空闲的连接数', ('engine',))
+DB_POOL_OVERFLOW = registry.gauge('db_pool_overflow', '连接池超出常驻数的连接数（为负表示尚未建满）', ('engine',))
+CACHE_HITS = registry.counter('response_cache_hits_total', '响应缓存命中次数')
+CACHE_MISSES = registry.counter('response_cache_misses_total', '响应缓存未命中次数')
+CACHE_HIT_RATIO = registry.gauge('response_cache_hit_ratio', '响应缓存命中率')
+LOG_DROPPED = registry.counter('log_records_dropped_total', '日志队列已满而丢弃的日志条数')
+
+
+def _collect_pools():
+    for key, engine in db.engines.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            name = key or 'primary'
+            yield DB_POOL_SIZE, (name,), pool.size()
+            yield DB_POOL_CHECKED_OUT, (name,), pool.checkedout()
+            yield DB_POOL_CHECKED_IN, (name,), pool.checkedin()
+            yield DB_POOL_OVERFLOW, (name,), pool.overflow()
+
+
+def _collect_counters():
+    yield CACHE_HITS, (), response_cache.hits
+    yield CACHE_MISSES, (), response_cache.misses
+    yield LOG_DROPPED, (), request_log.dropped
+
+
+registry.collectors.extend([_collect_pools, _collect_counters])
+
+
+class Metrics:
+    """请求指标采集，用法与 Flask 扩展一致：metrics.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.directory = ''
+        self._exit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_MULTIPROC_DIR', '')
+        app.config.setdefault('METRICS_WRITE_INTERVAL', 5)
+        self.app = app
+        self.enabled = app.config['METRICS_ENABLED']
+        self.directory = app.config['METRICS_MULTIPROC_DIR']
+        if not self.enabled:
+            return
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            if not self._exit_registered:
+                # 进程退出前写入最后一次快照，计数不会因为 worker 退出而丢失
+                atexit.register(self._write_at_exit)
+                self._exit_registered = True
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def write_snapshot(self):
+        """多进程模式下写入本进程的快照（需在应用上下文中调用）"""
+        if self.enabled and self.directory:
+            registry.write(self.directory)
+
+    def render(self):
+        """全部指标的 Prometheus 文本（需在应用上下文中调用）"""
+        if self.directory:
+            self.write_snapshot()
+            data = registry.aggregate(self.directory)
+        else:
+            data = registry.snapshot()
+        hits = data.get(CACHE_HITS.name, {}).get((), 0)
+        misses = data.get(CACHE_MISSES.name, {}).get((), 0)
+        data[CACHE_HIT_RATIO.name] = {(): hits / (hits + misses) if hits + misses else 0.0}
+        return registry.render(data)
+
+    @staticmethod
+    def _route():
+        # 未匹配的路径统一记为 <unmatched>，避免任意 URL 产生大量标签
+        return request.url_rule.rule if request.url_rule else '<unmatched>'
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_route = self._route()
+        IN_FLIGHT.inc(g.metrics_route)
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        route = g.metrics_route
+        REQUESTS.inc(request.method, route, str(response.status_code))
+        REQUEST_DURATION.observe(time.perf_counter() - started, request.method, route)
+        stats = g.get('db_stats')
+        if stats is not None and stats.count:
+            DB_QUERIES.inc(route, amount=stats.count)
+            DB_QUERY_SECONDS.inc(route, amount=stats.seconds)
+        return response
+
+    def _teardown_request(self, exc):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            IN_FLIGHT.dec(route)
+
+    def _write_at_exit(self):
+        try:
+            with self.app.app_context():
+                self.write_snapshot()
+        except Exception:
+            logger.exception('指标快照写入失败')
+
+
+metrics = Metrics()
@@ -0,0 +1,128 @@
+# 数据库结构版本管理
+# 已执行的版本记录在 schema_migrations 表中，upgrade() 按版本号顺序执行尚未执行的迁移。
+# 每个迁移都必须可重复执行（先检查表/列/索引是否已存在），因为全新数据库在版本 1
+# 中直接按当前模型建表，后续版本对它来说应当什么都不做
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from models import db
+
+logger = logging.getLogger('blog.migrations')
+
+MIGRATIONS = []
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.MetaData(),
+    db.Column('version', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('description', db.String(200)),
+    db.Column('applied_at', db.DateTime),
+)
+
+
+def migration(version, description):
+    """注册一个迁移，被装饰的函数接收一个处于事务中的数据库连接"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def current_version(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return conn.execute(db.select(db.func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def upgrade(engine=None):
+    """执行所有未执行的迁移，返回执行过的版本号列表（需在应用上下文中调用）"""
+    engine = engine or db.engine
+    applied = []
+    with engine.begin() as conn:
+        version = current_version(conn)
+    for target, description, func in MIGRATIONS:
+        if target <= version:
+            continue
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=target, description=description, applied_at=datetime.utcnow()
+            ))
+        logger.info('已升级到版本 %s: %s', target, description)
+        applied.append(target)
+    return applied
+
+
+def _create_indexes(conn, table_name, index_names):
+    """按模型中的定义创建缺失的索引"""
+    existing = {index['name'] for index in inspect(conn).get_indexes(table_name)}
+    table = db.metadata.tables[table_name]
+    for index in table.indexes:
+        if index.name in index_names and index.name not in existing:
+            index.create(conn)
+
+
+@migration(1, '初始表结构')
+def create_tables(conn):
+    db.metadata.create_all(conn)
+
+
+@migration(2, '按查询模式添加复合索引，article_tags 增加 (article_id, tag_id) 唯一索引')
+def add_query_indexes(conn):
+    # 建唯一索引前先清理重复的文章-标签关联，保留最早的一条
+    conn.execute(text(
+        'DELETE FROM article_tags WHERE id NOT IN ('
+        'SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM article_tags '
+        'GROUP BY article_id, tag_id) AS keep)'
+    ))
+    _create_indexes(conn, 'articles', {
+        'ix_articles_status_created_at',
+        'ix_articles_author_status_created_at',
+    })
+    _create_indexes(conn, 'article_tags', {'uq_article_tags_article_tag', 'ix_article_tags_tag_id'})
+    _create_indexes(conn, 'likes', {'ix_likes_user_created_at', 'ix_likes_article_id'})
+
+
+@migration(3, 'MySQL 上为文章标题与正文添加 ngram 全文索引')
+def add_fulltext_index(conn):
+    # 其他数据库使用进程内倒排索引（见 search.py），不需要建索引
+    if conn.dialect.name != 'mysql':
+        return
+    existing = {index['name'] for index in inspect(conn).get_indexes('articles')}
+    if 'ft_articles_title_content' not in existing:
+        conn.execute(text(
+            'ALTER TABLE articles ADD FULLTEXT INDEX ft_articles_title_content (title, content) WITH PARSER ngram'
+        ))
+
+
+@migration(4, '标签增加已发布文章数 published_count，并按现有数据计算')
+def add_tag_published_count(conn):
+    columns = {column['name'] for column in inspect(conn).get_columns('tags')}
+    if 'published_count' not in columns:
+        conn.execute(text('ALTER TABLE tags ADD COLUMN published_count INTEGER NOT NULL DEFAULT 0'))
+    _create_indexes(conn, 'tags', {'ix_tags_published_count'})
+    conn.execute(text(
+        'UPDATE tags SET published_count = ('
+        'SELECT COUNT(*) FROM article_tags JOIN articles ON articles.id = article_tags.article_id '
+        "WHERE article_tags.tag_id = tags.id AND articles.status = 'published')"
+    ))
+
+
+@migration(5, '全站统计汇总表 site_stats 与按天统计表 daily_stats，并按现有数据计算')
+def add_site_stats(conn):
+    from stats import rebuild_stats
+    for name in ('site_stats', 'daily_stats'):
+        db.metadata.tables[name].create(conn, checkfirst=True)
+    rebuild_stats(conn)
+
+
+@migration(6, '删除热门排行改为内存计算后不再使用的索引 ix_articles_status_views_likes')
+def drop_hot_articles_index(conn):
+    # 早期的版本 2 创建了该索引；每次浏览量与点赞数更新都要维护它
+    existing = {index['name'] for index in inspect(conn).get_indexes('articles')}
+    if 'ix_articles_status_views_likes' in existing:
+        # MySQL 的 DROP INDEX 需要指明表名
+        on_table = ' ON articles' if conn.dialect.name == 'mysql' else ''
+        conn.execute(text(f'DROP INDEX ix_articles_status_views_likes{on_table}'))
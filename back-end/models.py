@@ -1,9 +1,33 @@
 from email.policy import default
+from flask import has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import bindparam
+from sqlalchemy.orm import defer
+from sqlalchemy.sql.dml import UpdateBase
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import password_hasher
 
-db = SQLAlchemy()
+class RoutingSession(Session):
+    """读写分离：配置了 replica 绑定时，GET/HEAD 请求中的查询走只读副本，写操作与后台任务走主库"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) \
+                and has_request_context() and request.method in ('GET', 'HEAD'):
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# 文章详情返回全部字段；列表接口默认返回摘要字段（不含正文），可用 ?fields= 调整
+ARTICLE_FIELDS = (
+    'id', 'title', 'content', 'excerpt', 'author', 'author_id', 'status',
+    'views', 'likes_count', 'created_at', 'updated_at', 'tags'
+)
+ARTICLE_SUMMARY_FIELDS = tuple(field for field in ARTICLE_FIELDS if field != 'content')
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -24,10 +48,14 @@ class User(db.Model):
     likes = db.relationship('Like', backref='user', lazy='dynamic')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """密码哈希是否使用了旧的哈希参数"""
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         return {
@@ -59,21 +87,36 @@ class Article(db.Model):
     tags = db.relationship('ArticleTag', backref='article', lazy='dynamic')
     likes = db.relationship('Like', backref='article', lazy='dynamic')
     
+    # 与 main.py 中的查询一一对应：文章列表 / 游标分页、作者文章列表（热门文章在内存中排行，不需要索引）
+    __table_args__ = (
+        db.Index('ix_articles_status_created_at', 'status', 'created_at'),
+        db.Index('ix_articles_author_status_created_at', 'author_id', 'status', 'created_at'),
+    )
+    
     def to_dict(self):
-        return {
+        return self._serialize(
+            self.author.username if self.author else None,
+            [tag.tag.name for tag in self.tags.all()]
+        )
+    
+    def _serialize(self, author_name, tag_names, fields=ARTICLE_FIELDS):
+        data = {
             'id': self.id,
             'title': self.title,
-            'content': self.content,
             'excerpt': self.excerpt,
-            'author': self.author.username if self.author else None,
+            'author': author_name,
             'author_id': self.author_id,
             'status': self.status,
             'views': self.views,
             'likes_count': self.likes_count,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None,
-            'tags': [tag.tag.name for tag in self.tags.all()]
+            'tags': tag_names
         }
+        # 正文只在需要时读取，列表查询中它是延迟加载列，读取会额外触发一次查询
+        if 'content' in fields:
+            data['content'] = self.content
+        return {field: data[field] for field in fields}
 
 class Tag(db.Model):
     __tablename__ = 'tags'
@@ -81,17 +124,27 @@ class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
     color = db.Column(db.String(20), default='blue')
+    # 已发布文章数，由文章的创建/修改/删除在同一事务中增量维护（见 adjust_tag_counts）
+    published_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # 关联关系
     articles = db.relationship('ArticleTag', backref='tag', lazy='dynamic')
     
-    def to_dict(self):
-        return {
+    # 热门标签按文章数排序
+    __table_args__ = (
+        db.Index('ix_tags_published_count', 'published_count'),
+    )
+    
+    def to_dict(self, with_count=False):
+        data = {
             'id': self.id,
             'name': self.name,
             'color': self.color
         }
+        if with_count:
+            data['article_count'] = self.published_count
+        return data
 
 class ArticleTag(db.Model):
     __tablename__ = 'article_tags'
@@ -100,6 +153,12 @@ class ArticleTag(db.Model):
     article_id = db.Column(db.Integer, db.ForeignKey('articles.id'), nullable=False)
     tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # 同一标签在一篇文章上只关联一次；按标签筛选文章时走 tag_id 索引
+    __table_args__ = (
+        db.Index('uq_article_tags_article_tag', 'article_id', 'tag_id', unique=True),
+        db.Index('ix_article_tags_tag_id', 'tag_id'),
+    )
 
 class Like(db.Model):
     __tablename__ = 'likes'
@@ -109,8 +168,33 @@ class Like(db.Model):
     article_id = db.Column(db.Integer, db.ForeignKey('articles.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # 确保用户不能对同一篇文章点赞多次
-    __table_args__ = (db.UniqueConstraint('user_id', 'article_id', name='unique_user_article_like'),)
+    # 确保用户不能对同一篇文章点赞多次；另加用户点赞列表（按时间倒序）与按文章统计点赞数的索引
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'article_id', name='unique_user_article_like'),
+        db.Index('ix_likes_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_likes_article_id', 'article_id'),
+    )
+
+class SiteStats(db.Model):
+    """全站统计汇总，只有 id = 1 一行；由写接口的增量定期写入，并定期与明细表对账（见 stats.py）"""
+    __tablename__ = 'site_stats'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_users = db.Column(db.BigInteger, nullable=False, default=0)
+    total_articles = db.Column(db.BigInteger, nullable=False, default=0)  # 已发布文章数
+    total_views = db.Column(db.BigInteger, nullable=False, default=0)
+    total_likes = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DailyStats(db.Model):
+    """按天（UTC）的统计：新用户、新发布文章、浏览量、点赞数"""
+    __tablename__ = 'daily_stats'
+    
+    day = db.Column(db.Date, primary_key=True)
+    new_users = db.Column(db.Integer, nullable=False, default=0)
+    new_articles = db.Column(db.Integer, nullable=False, default=0)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    likes = db.Column(db.Integer, nullable=False, default=0)
 
 # 保留原有的Passage模型以兼容现有数据
 class Passage(db.Model):
@@ -129,3 +213,130 @@ class Passage(db.Model):
             'time': self.time.strftime('%Y-%m-%d %H:%M:%S') if self.time else None
         }
 
+
+def parse_article_fields(value, default=ARTICLE_SUMMARY_FIELDS):
+    """解析 ?fields= 参数：summary、detail 或逗号分隔的字段名，含未知字段时抛出 ValueError"""
+    if not value:
+        return default
+    if value == 'summary':
+        return ARTICLE_SUMMARY_FIELDS
+    if value == 'detail':
+        return ARTICLE_FIELDS
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    unknown = [field for field in fields if field not in ARTICLE_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f'未知字段: {", ".join(unknown)}' if unknown else 'fields 不能为空')
+    return fields
+
+def article_load_options(fields):
+    """列表查询的加载选项：不需要正文时在 SQL 层延迟加载 content 列"""
+    return [] if 'content' in fields else [defer(Article.content)]
+
+def serialize_articles(articles, fields=ARTICLE_FIELDS):
+    """批量序列化文章列表：作者和标签各用一次 IN 查询加载，避免逐篇懒加载产生 N+1 查询"""
+    articles = list(articles)
+    if not articles:
+        return []
+    
+    authors = {}
+    if 'author' in fields:
+        author_ids = {article.author_id for article in articles}
+        authors = dict(
+            db.session.query(User.id, User.username)
+            .filter(User.id.in_(author_ids))
+            .all()
+        )
+    
+    tag_names = {}
+    if 'tags' in fields:
+        tag_rows = db.session.query(ArticleTag.article_id, Tag.name)\
+            .join(Tag, Tag.id == ArticleTag.tag_id)\
+            .filter(ArticleTag.article_id.in_([article.id for article in articles]))\
+            .order_by(ArticleTag.id)\
+            .all()
+        for article_id, name in tag_rows:
+            tag_names.setdefault(article_id, []).append(name)
+    
+    return [
+        article._serialize(authors.get(article.author_id), tag_names.get(article.id, []), fields)
+        for article in articles
+    ]
+
+def liked_article_ids(user_id, article_ids):
+    """一次 IN 查询返回用户已点赞的文章 id 集合"""
+    if not user_id or not article_ids:
+        return set()
+    rows = db.session.query(Like.article_id)\
+        .filter(Like.user_id == user_id, Like.article_id.in_(set(article_ids)))\
+        .all()
+    return {article_id for article_id, in rows}
+
+def make_excerpt(content, length=200):
+    """由正文生成摘要"""
+    return content[:length] + '...' if len(content) > length else content
+
+def check_tag_names(tags):
+    """检查请求中的标签列表（None 视为空列表），不是字符串数组或标签过长时抛出 ValueError"""
+    tags = tags or []
+    if not isinstance(tags, list) or not all(isinstance(tag, str) and len(tag.strip()) <= 50 for tag in tags):
+        raise ValueError('tags 应为字符串数组，每个标签最多 50 个字符')
+    return tags
+
+def resolve_tag_ids(names):
+    """把标签名解析为 ({name: tag_id}, 本次新建的标签名列表)：已有标签一次 IN 查询取出，缺少的一次批量插入
+
+    并发请求同时创建同名标签时，唯一约束冲突的一方重新查询后再插入剩余的标签。
+    调用方据新建列表决定是否让标签相关的缓存失效。
+    """
+    names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+    if not names:
+        return {}, []
+    
+    ids = {}
+    created = []
+    for _ in range(3):
+        missing = [name for name in names if name not in ids]
+        ids.update(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(missing)).all())
+        missing = [name for name in names if name not in ids]
+        if not missing:
+            break
+        now = datetime.utcnow()
+        try:
+            with db.session.begin_nested():
+                db.session.execute(Tag.__table__.insert(), [
+                    {'name': name, 'color': 'blue', 'created_at': now} for name in missing
+                ])
+        except IntegrityError:
+            continue
+        created.extend(missing)
+        ids.update(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(missing)).all())
+    return ids, created
+
+def article_tag_ids(article_id):
+    """文章关联的标签 id 列表"""
+    return [tag_id for tag_id, in db.session.query(ArticleTag.tag_id).filter_by(article_id=article_id).all()]
+
+def adjust_tag_counts(deltas):
+    """按 {tag_id: 增量} 批量调整标签的已发布文章数，在调用方的事务中执行
+
+    用 SQL 表达式增减，按 tag_id 顺序更新以减少并发事务之间的死锁。
+    """
+    params = [{'b_id': tag_id, 'b_delta': delta} for tag_id, delta in sorted(deltas.items()) if delta]
+    if not params:
+        return
+    table = Tag.__table__
+    stmt = table.update()\
+        .where(table.c.id == bindparam('b_id'))\
+        .values(published_count=table.c.published_count + bindparam('b_delta'))
+    db.session.execute(stmt, params)
+
+def adjust_likes_counts(deltas):
+    """按 {article_id: 增量} 批量调整文章的点赞数，在调用方的事务中执行，按 article_id 顺序更新"""
+    params = [{'b_id': article_id, 'b_delta': delta} for article_id, delta in sorted(deltas.items()) if delta]
+    if not params:
+        return
+    table = Article.__table__
+    stmt = table.update()\
+        .where(table.c.id == bindparam('b_id'))\
+        .values(likes_count=table.c.likes_count + bindparam('b_delta'))
+    db.session.execute(stmt, params)
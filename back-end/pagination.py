@@ -0,0 +1,57 @@
+# 游标（keyset）分页
+# 按 (created_at, id) 倒序翻页：下一页直接用上一页最后一条记录的排序键做范围条件，
+# 借助索引定位起点，不再随页码增大而扫描并丢弃前面的所有行（OFFSET），也不需要每次 COUNT(*)
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, item_id):
+    """把排序键编码为不透明的游标字符串"""
+    raw = json.dumps([created_at.isoformat(), item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except Exception:
+        raise ValueError('游标格式不正确')
+
+
+def keyset_paginate(query, created_column, id_column, cursor, per_page):
+    """按 (created_column, id_column) 倒序取一页
+
+    cursor 为空表示第一页。返回 (items, next_cursor)，没有下一页时 next_cursor 为 None。
+    per_page 小于 1 时抛出 ValueError（LIMIT 0 无法判断下一页，SQLite 中负数的 LIMIT 表示不限制）。
+    """
+    if per_page < 1:
+        raise ValueError('per_page 至少为 1')
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < item_id)
+        ))
+
+    # 多取一条用来判断是否还有下一页
+    items = query.order_by(created_column.desc(), id_column.desc()).limit(per_page + 1).all()
+    if len(items) <= per_page:
+        return items, None
+
+    items = items[:per_page]
+    last = items[-1]
+    return items, encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+
+def cursor_meta(query, next_cursor, with_total=False):
+    """游标分页响应中的分页字段，总数只在调用方明确要求时才统计"""
+    meta = {'next_cursor': next_cursor, 'has_more': next_cursor is not None}
+    if with_total:
+        meta['total'] = query.order_by(None).count()
+    return meta
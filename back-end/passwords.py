@@ -0,0 +1,132 @@
+# 密码哈希
+# PBKDF2 每次计算需要几十毫秒 CPU。直接在请求线程中计算时，一波集中登录会占满 CPU，
+# 其他接口也跟着变慢。这里把哈希计算交给固定大小的线程池（hashlib 计算期间释放 GIL），
+# 同时最多只有 PASSWORD_HASH_WORKERS 个哈希在运行，排队数超过上限时直接拒绝，
+# 不让登录请求无限堆积。哈希参数可配置，参数调整后用户下次登录时按新参数重新哈希
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(RuntimeError):
+    """哈希任务排队已满"""
+
+
+class PasswordHasher:
+    """密码哈希线程池，用法与 Flask 扩展一致：password_hasher.init_app(app)
+
+    未调用 init_app（如 db_init.py 等脚本）时使用默认参数。
+    """
+
+    def __init__(self, app=None):
+        self.method = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+        self.salt_length = 16
+        self.workers = 2
+        self.max_queue = 32
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._hash_total = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', self.method)
+        app.config.setdefault('PASSWORD_HASH_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_MAX_QUEUE', 32)
+        self.method = self.normalize_method(app.config['PASSWORD_HASH_METHOD'])
+        self.salt_length = app.config['PASSWORD_HASH_SALT_LENGTH']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_queue = app.config['PASSWORD_HASH_MAX_QUEUE']
+        # 重新初始化时按新的线程数重建线程池
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._pid = None
+
+    @staticmethod
+    def normalize_method(method):
+        """补全省略的 PBKDF2 迭代次数，与哈希串中记录的方法保持一致"""
+        parts = method.split(':')
+        if parts[0] == 'pbkdf2' and len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+        return ':'.join(parts)
+
+    def hash(self, password):
+        return self._call(generate_password_hash, password, self.method, self.salt_length)
+
+    def check(self, password_hash, password):
+        return self._call(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """哈希串的方法或盐长度与当前配置不一致时返回 True"""
+        method, _, rest = (password_hash or '').partition('$')
+        salt = rest.partition('$')[0]
+        return method != self.method or len(salt) != self.salt_length
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': self._pending - self._running,
+                'running': self._running,
+                'completed': completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(self._wait_total / completed * 1000, 2) if completed else 0,
+                'avg_hash_ms': round(self._hash_total / completed * 1000, 2) if completed else 0,
+            }
+
+    def _call(self, func, *args):
+        """在线程池中执行并等待结果；PASSWORD_HASH_WORKERS <= 0 时在当前线程执行"""
+        if self.workers <= 0:
+            return func(*args)
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PasswordHasherBusy('密码校验请求过多，请稍后重试')
+            self._pending += 1
+        submitted = time.perf_counter()
+        try:
+            return self._get_executor().submit(self._run, submitted, func, args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _run(self, submitted, func, args):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._wait_total += started - submitted
+                self._hash_total += finished - started
+
+    def _get_executor(self):
+        # fork 出的子进程不会继承父进程线程池中的线程，按进程创建
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                    self._pid = os.getpid()
+        return self._executor
+
+
+password_hasher = PasswordHasher()
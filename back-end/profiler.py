@@ -0,0 +1,152 @@
+# SQL 分析
+# 开启 SQL_PROFILER_ENABLED 后，通过 SQLAlchemy 的 before/after_cursor_execute 事件记录每条语句的
+# 指纹（字面量、占位符替换为 ?，IN 列表合并后的 SQL）、耗时与次数：
+# 超过 SQL_SLOW_QUERY_MS 的语句写入慢查询日志（blog.sql，只记录指纹，不记录参数）；
+# 一个请求内同一指纹执行超过 SQL_N_PLUS_ONE_THRESHOLD 次时记一条疑似 N+1 的警告；
+# 请求带 X-SQL-Profile: 1 头时，在同名响应头中返回本请求的 SQL 汇总（JSON）。
+# 默认关闭，关闭时不注册任何事件，没有额外开销
+import json
+import logging
+import re
+import time
+
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('blog.sql')
+
+PROFILE_HEADER = 'X-SQL-Profile'
+
+# 汇总中每条指纹最多保留的字符数，避免响应头过长
+MAX_FINGERPRINT_LENGTH = 200
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|(?<!:):\w+')
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+_fingerprints = {}
+
+
+def fingerprint(statement):
+    """SQL 语句的指纹：参数不同、IN 列表长度不同的同一类语句得到相同的指纹"""
+    result = _fingerprints.get(statement)
+    if result is None:
+        text = _STRING.sub('?', statement)
+        text = _PLACEHOLDER.sub('?', text)
+        text = _NUMBER.sub('?', text)
+        text = _IN_LIST.sub('(?...)', text)
+        result = _SPACE.sub(' ', text).strip()
+        # 语句种类有限，缓存满了直接清空即可
+        if len(_fingerprints) >= 4096:
+            _fingerprints.clear()
+        _fingerprints[statement] = result
+    return result
+
+
+class RequestProfile:
+    """一个请求内各指纹的执行次数与耗时（秒），保存在 g.sql_profile"""
+
+    __slots__ = ('queries',)
+
+    def __init__(self):
+        self.queries = {}
+
+    def add(self, key, seconds):
+        item = self.queries.get(key)
+        if item is None:
+            self.queries[key] = [1, seconds]
+        else:
+            item[0] += 1
+            item[1] += seconds
+
+    def summary(self, n_plus_one_threshold, top=5):
+        """汇总：总条数、总耗时、不同指纹数、耗时最多的 top 条指纹，以及疑似 N+1 的指纹"""
+        items = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            'queries': sum(count for count, _ in self.queries.values()),
+            'db_ms': round(sum(seconds for _, seconds in self.queries.values()) * 1000, 2),
+            'distinct': len(self.queries),
+            'top': [
+                {'sql': key[:MAX_FINGERPRINT_LENGTH], 'count': count, 'ms': round(seconds * 1000, 2)}
+                for key, (count, seconds) in items[:top]
+            ],
+            'n_plus_one': [
+                {'sql': key[:MAX_FINGERPRINT_LENGTH], 'count': count}
+                for key, (count, _) in items if count > n_plus_one_threshold
+            ],
+        }
+
+
+def _route():
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else request.path
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiler_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_profiler_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    key = fingerprint(statement)
+    if elapsed * 1000 >= sql_profiler.slow_query_ms:
+        logger.warning('慢查询 %.1f ms: %s', elapsed * 1000, key, extra={'fields': {
+            'duration_ms': round(elapsed * 1000, 2),
+            'route': _route(),
+        }})
+    if has_app_context():
+        profile = g.get('sql_profile')
+        if profile is not None:
+            profile.add(key, elapsed)
+
+
+class SqlProfiler:
+    """按请求分析 SQL，用法与 Flask 扩展一致：sql_profiler.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.slow_query_ms = 100
+        self.n_plus_one_threshold = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_PROFILER_ENABLED', False)
+        app.config.setdefault('SQL_SLOW_QUERY_MS', 100)
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.enabled = app.config['SQL_PROFILER_ENABLED']
+        self.slow_query_ms = app.config['SQL_SLOW_QUERY_MS']
+        self.n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        if not self.enabled:
+            return
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.sql_profile = RequestProfile()
+
+    def _after_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        summary = profile.summary(self.n_plus_one_threshold)
+        for item in summary['n_plus_one']:
+            logger.warning('疑似 N+1：同一语句在一个请求中执行了 %s 次: %s', item['count'], item['sql'],
+                           extra={'fields': {'route': _route(), 'count': item['count']}})
+        if request.headers.get(PROFILE_HEADER) == '1':
+            response.headers[PROFILE_HEADER] = json.dumps(summary, separators=(',', ':'))
+        return response
+
+
+sql_profiler = SqlProfiler()
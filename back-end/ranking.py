@@ -0,0 +1,128 @@
+# 热门文章排行
+# 热度 = (浏览量 + 点赞权重 * 点赞数) * 2 ^ (-文章年龄 / 半衰期)。
+# 取对数后 log2(热度) = log2(互动量) + 发布时间 / 半衰期 - 当前时间 / 半衰期，
+# 最后一项对所有文章相同，所以排序只取决于前两项，与当前时间无关：
+# 浏览/点赞变化时只需重算这一篇的排序键，排行不会因为时间流逝而需要整体重排。
+# 排行按排序键降序保存在内存有序列表中，/api/articles/hot 变成取前 K 个；
+# 后台任务定期从数据库全量重建，修正多进程之间各自增量带来的偏差
+import bisect
+import math
+import threading
+from datetime import datetime, timedelta
+
+from models import db, Article
+from view_counter import view_counter
+
+# 可选的统计窗口：只在该时间范围内发布的文章中排名
+WINDOWS = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    'all': None,
+}
+
+
+class HotRanking:
+    """内存中的热门文章排行，用法与 Flask 扩展一致：hot_ranking.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.like_weight = 5
+        self.half_life = 48 * 3600
+        self._lock = threading.Lock()
+        self._entries = {}  # article_id -> [created_at, views, likes_count, key]
+        self._order = []    # [(-key, article_id)]，升序即热度降序
+        self._built = False
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HOT_RANK_LIKE_WEIGHT', 5)
+        app.config.setdefault('HOT_RANK_HALF_LIFE_HOURS', 48)
+        self.like_weight = app.config['HOT_RANK_LIKE_WEIGHT']
+        self.half_life = app.config['HOT_RANK_HALF_LIFE_HOURS'] * 3600
+        self.app = app
+
+    def score_key(self, created_at, views, likes_count):
+        """时间无关的排序键，等价于 log2(衰减后的热度) + 常数"""
+        engagement = (views or 0) + self.like_weight * (likes_count or 0)
+        created_ts = (created_at or datetime.utcnow()).timestamp()
+        return math.log2(engagement + 1) + created_ts / self.half_life
+
+    def rebuild(self):
+        """从数据库全量重建排行（需在应用上下文中调用），返回参与排行的文章数"""
+        rows = db.session.query(Article.id, Article.created_at, Article.views, Article.likes_count)\
+            .filter(Article.status == 'published')\
+            .all()
+        pending = view_counter.pending_all()
+
+        entries = {}
+        for article_id, created_at, views, likes_count in rows:
+            views = (views or 0) + pending.get(article_id, 0)
+            entries[article_id] = [created_at, views, likes_count or 0,
+                                   self.score_key(created_at, views, likes_count)]
+        order = sorted((-entry[3], article_id) for article_id, entry in entries.items())
+
+        with self._lock:
+            self._entries = entries
+            self._order = order
+            self._built = True
+        return len(entries)
+
+    def upsert(self, article_id, created_at, views, likes_count):
+        """新增或整体更新一篇文章（发布、修改后调用）"""
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(article_id)
+            self._insert(article_id, created_at, views or 0, likes_count or 0)
+
+    def update(self, article_id, views_delta=0, likes_delta=0):
+        """浏览量/点赞数增量变化时调用，只重算这一篇的排序键"""
+        with self._lock:
+            entry = self._entries.get(article_id)
+            if entry is None:
+                return
+            created_at, views, likes_count, key = entry
+            self._remove(article_id)
+            self._insert(article_id, created_at, views + views_delta, max(0, likes_count + likes_delta))
+
+    def remove(self, article_id):
+        """文章删除或不再公开时调用"""
+        with self._lock:
+            self._remove(article_id)
+
+    def reset(self):
+        """丢弃内存中的排行，下次取排行时从数据库重建（批量导入等大量变化后调用）"""
+        with self._lock:
+            self._built = False
+
+    def top(self, limit, window='all'):
+        """返回热度最高的 limit 篇文章 id，首次调用时从数据库构建排行"""
+        if not self._built:
+            self.rebuild()
+        span = WINDOWS[window]
+        since = datetime.utcnow() - span if span else None
+        result = []
+        with self._lock:
+            for _, article_id in self._order:
+                if len(result) >= limit:
+                    break
+                if since is None or (self._entries[article_id][0] or datetime.min) >= since:
+                    result.append(article_id)
+        return result
+
+    def _insert(self, article_id, created_at, views, likes_count):
+        key = self.score_key(created_at, views, likes_count)
+        self._entries[article_id] = [created_at, views, likes_count, key]
+        bisect.insort(self._order, (-key, article_id))
+
+    def _remove(self, article_id):
+        entry = self._entries.pop(article_id, None)
+        if entry is None:
+            return
+        index = bisect.bisect_left(self._order, (-entry[3], article_id))
+        if index < len(self._order) and self._order[index] == (-entry[3], article_id):
+            del self._order[index]
+
+
+hot_ranking = HotRanking()
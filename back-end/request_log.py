@@ -0,0 +1,242 @@
+# 日志与请求记录
+# 应用日志（logger 名以 blog 开头）先放入有界队列，由单独的线程写到 stderr 或文件
+# （QueueHandler + QueueListener），请求线程不会因为写输出而阻塞；队列满时丢弃并计数。
+# 每个请求结束时输出一条结构化记录：方法、路由、状态码、耗时、SQL 条数与耗时
+# （SQL 通过 SQLAlchemy 的 cursor_execute 事件统计）。
+# 采样：LOG_REQUEST_SAMPLE_RATE 为正常请求的记录比例（5xx 与慢请求总是记录）；
+# LOG_DEBUG_SAMPLE_RATE 为按请求开启 DEBUG 日志的比例，生产环境可以只让少量请求输出调试细节
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+from flask import g, has_app_context, request
+from flask.logging import default_handler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('blog')
+access_logger = logging.getLogger('blog.request')
+
+
+class QueryStats:
+    """一个请求内执行的 SQL 条数与累计耗时（秒），保存在 g.db_stats"""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if has_app_context():
+        stats = g.get('db_stats')
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += time.perf_counter() - started
+
+
+def _handle_db_error(exception_context):
+    # 语句执行失败时不会触发 after_cursor_execute，这里弹出对应的开始时间
+    started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式，结构化字段以 key=value 附在消息后"""
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None)
+        if fields:
+            record.message_fields = ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        else:
+            record.message_fields = ''
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON，结构化字段平铺在顶层"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """入队不阻塞的 QueueHandler：队列满时丢弃；每个进程第一次写日志时启动写出线程"""
+
+    def __init__(self, owner):
+        super().__init__(None)
+        self.owner = owner
+
+    def filter(self, record):
+        # 低于 LOG_LEVEL 的日志只在被调试采样的请求中输出
+        if record.levelno < self.owner.level and not (has_app_context() and g.get('log_debug')):
+            return False
+        return super().filter(record)
+
+    def prepare(self, record):
+        # 在写日志的线程中完成消息插值与异常堆栈格式化，写出线程只负责输出
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.owner.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.owner.dropped += 1
+
+
+class RequestLog:
+    """日志配置与请求记录，用法与 Flask 扩展一致：request_log.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.queue_size = 10000
+        self.request_sample_rate = 1.0
+        self.debug_sample_rate = 0.0
+        self.level = logging.INFO
+        self.slow_request_ms = 500
+        self.dropped = 0
+        self.handler = _NonBlockingQueueHandler(self)
+        self.output = None
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._exit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_FORMAT', 'text')
+        app.config.setdefault('LOG_FILE', '')
+        app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+        app.config.setdefault('LOG_REQUEST_SAMPLE_RATE', 1.0)
+        app.config.setdefault('LOG_DEBUG_SAMPLE_RATE', 0.0)
+        app.config.setdefault('LOG_SLOW_REQUEST_MS', 500)
+        self.app = app
+        self.queue_size = app.config['LOG_QUEUE_SIZE']
+        self.request_sample_rate = app.config['LOG_REQUEST_SAMPLE_RATE']
+        self.debug_sample_rate = app.config['LOG_DEBUG_SAMPLE_RATE']
+        self.slow_request_ms = app.config['LOG_SLOW_REQUEST_MS']
+
+        self.level = logging.getLevelName(str(app.config['LOG_LEVEL']).upper())
+        if not isinstance(self.level, int):
+            raise ValueError(f"不支持的日志级别: {app.config['LOG_LEVEL']}")
+        # 开启调试采样时 logger 放行 DEBUG，再由 handler 按请求过滤；
+        # 不采样时低于 LOG_LEVEL 的日志在 logger.debug() 调用处就直接返回，几乎没有开销
+        logger.setLevel(logging.DEBUG if self.debug_sample_rate > 0 else self.level)
+
+        # 写出线程使用的 handler，重新初始化时替换，下次启动写出线程时生效
+        if app.config['LOG_FILE']:
+            output = WatchedFileHandler(app.config['LOG_FILE'], encoding='utf-8')
+        else:
+            output = logging.StreamHandler(sys.stderr)
+        if app.config['LOG_FORMAT'] == 'json':
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s%(message_fields)s'))
+        with self._lock:
+            self.stop()
+            self.output = output
+
+        for target in (logger, app.logger):
+            if self.handler not in target.handlers:
+                target.addHandler(self.handler)
+        # Flask 的未处理异常日志也走队列
+        app.logger.removeHandler(default_handler)
+        logger.propagate = False
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_db_error)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not self._exit_registered:
+            # 进程退出前写出队列中剩余的日志
+            atexit.register(self.stop)
+            self._exit_registered = True
+
+    def start(self):
+        """启动当前进程的写出线程（fork 出的子进程需要自己的队列与线程）"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.handler.queue = queue.Queue(self.queue_size)
+            self._listener = QueueListener(self.handler.queue, self.output)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """停止写出线程，等待队列中的日志写完"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+        self._listener = None
+        self._pid = None
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        g.db_stats = QueryStats()
+        g.log_debug = self.debug_sample_rate > 0 and random.random() < self.debug_sample_rate
+
+    def _after_request(self, response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        duration_ms = (time.perf_counter() - started) * 1000
+        status = response.status_code
+        if status >= 500:
+            level = logging.ERROR
+        elif duration_ms >= self.slow_request_ms:
+            level = logging.WARNING
+        elif g.log_debug or random.random() < self.request_sample_rate:
+            level = logging.INFO
+        else:
+            return response
+
+        stats = g.db_stats
+        access_logger.log(level, '%s %s %s', request.method, request.path, status, extra={'fields': {
+            'method': request.method,
+            'route': request.url_rule.rule if request.url_rule else None,
+            'status': status,
+            'duration_ms': round(duration_ms, 2),
+            'db_queries': stats.count,
+            'db_ms': round(stats.seconds * 1000, 2),
+            'user_id': g.get('user_id'),
+        }})
+        return response
+
+
+request_log = RequestLog()
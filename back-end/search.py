@@ -0,0 +1,253 @@
+# 文章全文搜索
+# 两种后端：
+# - MySQL：使用 ngram 分词的 FULLTEXT 索引（见 migrations.py 版本 3），由数据库自动维护
+# - 其他数据库（开发环境的 SQLite）：进程内倒排索引，中文按二元组（bigram）切分，
+#   英文/数字按单词切分，BM25 打分；写接口同步更新，后台任务定期与数据库对账，
+#   以便看到其他 worker 进程的修改
+# SQLite 的 FTS5 默认分词器不切分中文，因此这里不使用 FTS5
+import heapq
+import html
+import math
+import re
+import threading
+from collections import Counter
+
+from sqlalchemy import inspect, text
+
+from models import db, Article
+
+TAG_RE = re.compile(r'<[^>]+>')
+WORD_RE = re.compile(r'[a-z0-9]+|[\u3400-\u9fff\uf900-\ufaff]+')
+CJK_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]')
+
+# 标题中的词按多次出现计入词频，使标题命中排在正文命中之前
+TITLE_WEIGHT = 3
+
+
+def strip_html(content):
+    return html.unescape(TAG_RE.sub(' ', content or ''))
+
+
+def tokenize(text_):
+    """切分为检索词：英文/数字整词，中文连续片段切成二元组（单字片段保留单字）"""
+    tokens = []
+    for run in WORD_RE.findall((text_ or '').lower()):
+        if CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def highlight(text_, query, max_length=200):
+    """在纯文本中用 <em> 标记命中的关键词及其中文二元组，并截取第一个命中附近的片段"""
+    plain = ' '.join(strip_html(text_).split())
+    terms = {k for k in query.lower().split()} | set(tokenize(query))
+    lower = plain.lower()
+    if len(lower) != len(plain):
+        lower = plain
+
+    # 标记所有被命中覆盖的字符，相邻/重叠的命中合并为一段
+    covered = [False] * len(plain)
+    for term in terms:
+        pos = lower.find(term)
+        while term and pos != -1:
+            covered[pos:pos + len(term)] = [True] * len(term)
+            pos = lower.find(term, pos + 1)
+
+    first = covered.index(True) if True in covered else 0
+    start = max(0, first - max_length // 4)
+    end = min(len(plain), start + max_length)
+    parts = []
+    i = start
+    while i < end:
+        j = i
+        while j < end and covered[j] == covered[i]:
+            j += 1
+        segment = html.escape(plain[i:j])
+        parts.append(f'<em>{segment}</em>' if covered[i] else segment)
+        i = j
+    return ('...' if start > 0 else '') + ''.join(parts) + ('...' if end < len(plain) else '')
+
+
+class InvertedIndex:
+    """进程内倒排索引，BM25 打分"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, max_chars=5000):
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._postings = {}   # term -> {article_id: tf}
+        self._terms = {}      # term -> term，字符串驻留
+        self._doc_terms = {}  # article_id -> (terms...)，删除/更新时用于清理倒排表
+        self._doc_len = {}
+        self._versions = {}   # article_id -> updated_at，对账时判断是否需要重建该文档
+        self._total_len = 0
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def add(self, article_id, title, content, version=None):
+        counts = Counter(tokenize(title) * TITLE_WEIGHT)
+        counts.update(tokenize(strip_html(content)[:self.max_chars]))
+        with self._lock:
+            self._remove(article_id)
+            terms = []
+            for term, tf in counts.items():
+                # 复用倒排表中已有的字符串对象，各文档的词列表不再各自持有一份副本
+                term = self._terms.setdefault(term, term)
+                self._postings.setdefault(term, {})[article_id] = tf
+                terms.append(term)
+            self._doc_terms[article_id] = tuple(terms)
+            length = sum(counts.values())
+            self._doc_len[article_id] = length
+            self._versions[article_id] = version
+            self._total_len += length
+
+    def remove(self, article_id):
+        with self._lock:
+            self._remove(article_id)
+
+    def search(self, query, limit):
+        """返回 (命中总数, [(article_id, score), ...])"""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0, []
+        with self._lock:
+            n = len(self._doc_len)
+            if not n:
+                return 0, []
+            avg_len = self._total_len / n
+            scores = {}
+            matched = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for article_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[article_id] / avg_len)
+                    scores[article_id] = scores.get(article_id, 0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched[article_id] += 1
+        # 命中查询词越多越靠前，其次按 BM25 分数
+        top = heapq.nlargest(limit, scores, key=lambda a: (matched[a], scores[a]))
+        return len(scores), [(article_id, round(scores[article_id], 4)) for article_id in top]
+
+    def versions(self):
+        return dict(self._versions)
+
+    def _remove(self, article_id):
+        terms = self._doc_terms.pop(article_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(article_id, None)
+                if not postings:
+                    del self._postings[term]
+                    del self._terms[term]
+        self._total_len -= self._doc_len.pop(article_id)
+        self._versions.pop(article_id, None)
+
+
+class ArticleSearch:
+    """文章搜索，用法与 Flask 扩展一致：article_search.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.index = InvertedIndex()
+        self.backend = None
+        self._built = False
+        self._build_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.config.setdefault('SEARCH_INDEX_MAX_CHARS', 5000)
+        self.backend = app.config['SEARCH_BACKEND']
+        self.index.max_chars = app.config['SEARCH_INDEX_MAX_CHARS']
+
+    def uses_fulltext(self):
+        """是否使用 MySQL FULLTEXT 索引（需在应用上下文中调用）"""
+        if self.backend == 'auto':
+            self.backend = 'memory'
+            if db.engine.dialect.name == 'mysql':
+                indexes = inspect(db.engine).get_indexes('articles')
+                if any(index['name'] == 'ft_articles_title_content' for index in indexes):
+                    self.backend = 'mysql'
+        return self.backend == 'mysql'
+
+    def search(self, query, limit=20):
+        """返回 (命中总数, [(article_id, score), ...])，按相关度降序"""
+        if self.uses_fulltext():
+            return self._search_fulltext(query, limit)
+        if not self._built:
+            self.rebuild()
+        return self.index.search(query, limit)
+
+    # 以下为进程内索引的维护接口，使用 MySQL FULLTEXT 时无需调用（数据库自动维护）
+    def add(self, article):
+        if not self._built or self.backend == 'mysql':
+            return
+        if article.status == 'published':
+            self.index.add(article.id, article.title, article.content, article.updated_at)
+        else:
+            self.index.remove(article.id)
+
+    def remove(self, article_id):
+        if self._built and self.backend != 'mysql':
+            self.index.remove(article_id)
+
+    def rebuild(self):
+        """从数据库全量构建进程内索引（需在应用上下文中调用）"""
+        with self._build_lock:
+            index = InvertedIndex(self.index.max_chars)
+            query = db.session.query(Article.id, Article.title, Article.content, Article.updated_at)\
+                .filter(Article.status == 'published')
+            for article_id, title, content, updated_at in query.yield_per(1000):
+                index.add(article_id, title, content, updated_at)
+            self.index = index
+            self._built = True
+        return len(index)
+
+    def refresh(self):
+        """与数据库对账：重建有变化的文档、移除已删除或下线的文档，返回变化的文档数"""
+        if not self._built or self.uses_fulltext():
+            return 0
+        known = self.index.versions()
+        current = dict(
+            db.session.query(Article.id, Article.updated_at)
+            .filter(Article.status == 'published')
+            .all()
+        )
+        changed = [article_id for article_id, version in current.items() if known.get(article_id, 0) != version]
+        removed = [article_id for article_id in known if article_id not in current]
+        for article_id in removed:
+            self.index.remove(article_id)
+        for start in range(0, len(changed), 500):
+            chunk = changed[start:start + 500]
+            for article in Article.query.filter(Article.id.in_(chunk)).all():
+                self.index.add(article.id, article.title, article.content, article.updated_at)
+        return len(changed) + len(removed)
+
+    def _search_fulltext(self, query, limit):
+        match = "MATCH(title, content) AGAINST(:q IN NATURAL LANGUAGE MODE)"
+        total = db.session.execute(
+            text(f"SELECT COUNT(*) FROM articles WHERE status = 'published' AND {match}"),
+            {'q': query}
+        ).scalar()
+        rows = db.session.execute(
+            text(f"SELECT id, {match} AS score FROM articles "
+                 f"WHERE status = 'published' AND {match} ORDER BY score DESC LIMIT :limit"),
+            {'q': query, 'limit': limit}
+        ).all()
+        return total, [(row.id, round(float(row.score), 4)) for row in rows]
+
+
+article_search = ArticleSearch()
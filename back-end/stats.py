@@ -0,0 +1,223 @@
+# 全站统计
+# /api/stats 原来每次请求都要对 users、articles 做 COUNT 和 SUM 全表扫描。现在统计值保存在
+# site_stats 的一行中，按天的统计保存在 daily_stats 中：写接口在提交后把增量记入进程内缓冲
+# （注册 +1 用户、点赞 ±1 等），后台任务每隔几秒用 SQL 表达式把增量批量写入，读取时只需按主键
+# 取一行再加上本进程尚未写入的增量。另一个后台任务定期按明细表重算，修正进程退出、
+# 多进程交错等原因造成的偏差。每天的浏览量无法从明细表还原，对账时保持不变
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, sqlite
+
+from models import db, User, Article, Like, SiteStats, DailyStats
+from view_counter import view_counter
+
+logger = logging.getLogger('blog.stats')
+
+# 统计项 -> (site_stats 列, daily_stats 列)
+FIELDS = {
+    'users': ('total_users', 'new_users'),
+    'articles': ('total_articles', 'new_articles'),
+    'views': ('total_views', 'views'),
+    'likes': ('total_likes', 'likes'),
+}
+
+
+def _today():
+    return datetime.utcnow().date()
+
+
+def _as_date(value):
+    # SQLite 的 DATE() 返回字符串
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def upsert_daily(executor, rows, add):
+    """写入 daily_stats：add 为 True 时各列累加，否则覆盖；rows 中每行须包含相同的列"""
+    if not rows:
+        return
+    table = DailyStats.__table__
+    columns = [key for key in rows[0] if key != 'day']
+    dialect = executor.get_bind(DailyStats.__mapper__, table.insert()).dialect \
+        if hasattr(executor, 'get_bind') else executor.dialect
+
+    if dialect.name in ('sqlite', 'mysql'):
+        module = sqlite if dialect.name == 'sqlite' else mysql
+        stmt = module.insert(table).values(rows)
+        new = stmt.excluded if dialect.name == 'sqlite' else stmt.inserted
+        values = {column: (table.c[column] + new[column]) if add else new[column] for column in columns}
+        if dialect.name == 'sqlite':
+            stmt = stmt.on_conflict_do_update(index_elements=['day'], set_=values)
+        else:
+            stmt = stmt.on_duplicate_key_update(values)
+        executor.execute(stmt)
+        return
+
+    # 其他数据库：先更新，没有这一天的行再插入
+    for row in rows:
+        values = {column: (table.c[column] + row[column]) if add else row[column] for column in columns}
+        result = executor.execute(table.update().where(table.c.day == row['day']).values(values))
+        if not result.rowcount:
+            executor.execute(table.insert().values(row))
+
+
+def rebuild_stats(executor, since=None):
+    """按明细表重算 site_stats，以及 since 之后（为空表示全部）每天的新用户、新文章、点赞数"""
+    totals = {
+        'total_users': executor.execute(db.select(func.count(User.id))).scalar() or 0,
+        'total_articles': executor.execute(
+            db.select(func.count(Article.id)).where(Article.status == 'published')
+        ).scalar() or 0,
+        'total_views': executor.execute(db.select(func.coalesce(func.sum(Article.views), 0))).scalar() or 0,
+        'total_likes': executor.execute(db.select(func.coalesce(func.sum(Article.likes_count), 0))).scalar() or 0,
+        'updated_at': datetime.utcnow(),
+    }
+    table = SiteStats.__table__
+    if not executor.execute(table.update().where(table.c.id == 1).values(totals)).rowcount:
+        executor.execute(table.insert().values(id=1, **totals))
+
+    daily = {}
+    for column, model, condition in (
+        ('new_users', User, None),
+        ('new_articles', Article, Article.status == 'published'),
+        ('likes', Like, None),
+    ):
+        day = func.date(model.created_at)
+        query = db.select(day, func.count(model.id)).where(model.created_at.isnot(None)).group_by(day)
+        if condition is not None:
+            query = query.where(condition)
+        if since is not None:
+            query = query.where(model.created_at >= datetime.combine(since, datetime.min.time()))
+        for value, count in executor.execute(query):
+            daily.setdefault(_as_date(value), {'new_users': 0, 'new_articles': 0, 'likes': 0})[column] = count
+
+    # 范围内没有明细的日期清零，再写入重算结果
+    daily_table = DailyStats.__table__
+    reset = daily_table.update().values(new_users=0, new_articles=0, likes=0)
+    if since is not None:
+        reset = reset.where(daily_table.c.day >= since)
+    executor.execute(reset)
+    upsert_daily(executor, [{'day': day, **counts} for day, counts in sorted(daily.items())], add=False)
+
+
+class SiteStatsRecorder:
+    """统计增量缓冲，用法与 Flask 扩展一致：site_stats.init_app(app)"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.reconcile_days = 7
+        self._lock = threading.Lock()
+        self._totals = Counter()
+        self._daily = {}  # day -> Counter
+        self._exit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATS_FLUSH_INTERVAL', 5)
+        app.config.setdefault('STATS_RECONCILE_INTERVAL', 3600)
+        app.config.setdefault('STATS_RECONCILE_DAYS', 7)
+        self.app = app
+        self.reconcile_days = app.config['STATS_RECONCILE_DAYS']
+        if not self._exit_registered:
+            # 进程退出前把剩余增量写入
+            atexit.register(self._flush_at_exit)
+            self._exit_registered = True
+
+    def record(self, day=None, daily=True, **deltas):
+        """记录统计增量（在写操作提交之后调用）
+
+        day 为计入哪一天，默认今天；daily 为 False 时只计入总数（如删除文章时扣除其浏览量）。
+        """
+        day = day or _today()
+        with self._lock:
+            for field, delta in deltas.items():
+                if not delta:
+                    continue
+                self._totals[field] += delta
+                if daily:
+                    self._daily.setdefault(day, Counter())[field] += delta
+
+    def flush(self):
+        """把缓冲的增量写入数据库（需在应用上下文中调用），返回写入的天数"""
+        with self._lock:
+            totals, daily = self._totals, self._daily
+            self._totals, self._daily = Counter(), {}
+        if not totals and not daily:
+            return 0
+        try:
+            if any(totals.values()):
+                values = {
+                    getattr(SiteStats, FIELDS[field][0]): getattr(SiteStats, FIELDS[field][0]) + delta
+                    for field, delta in totals.items() if delta
+                }
+                values[SiteStats.updated_at] = datetime.utcnow()
+                SiteStats.query.filter_by(id=1).update(values, synchronize_session=False)
+            upsert_daily(db.session, [
+                {'day': day, **{column: counts.get(field, 0) for field, (_, column) in FIELDS.items()}}
+                for day, counts in sorted(daily.items())
+            ], add=True)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # 写入失败时把增量放回缓冲，等待下次重试
+            with self._lock:
+                self._totals.update(totals)
+                for day, counts in daily.items():
+                    self._daily.setdefault(day, Counter()).update(counts)
+            raise
+        return len(daily)
+
+    def reconcile(self, full=False):
+        """先写入缓冲，再按明细表重算总数与最近 STATS_RECONCILE_DAYS 天（full 为 True 时为全部日期）的按天统计
+
+        总浏览量按 articles.views 求和，因此浏览量计数器的缓冲也要先写回，否则尚未写回的浏览会被算丢
+        """
+        self.flush()
+        view_counter.flush()
+        rebuild_stats(db.session, since=None if full else _today() - timedelta(days=self.reconcile_days - 1))
+        db.session.commit()
+
+    def totals(self):
+        """全站统计：按主键读取一行，加上本进程尚未写入的增量"""
+        row = SiteStats.query.get(1)
+        with self._lock:
+            pending = dict(self._totals)
+        return {
+            column: (getattr(row, column) if row else 0) + pending.get(field, 0)
+            for field, (column, _) in FIELDS.items()
+        }
+
+    def daily(self, days):
+        """最近 days 天（含今天）的按天统计，没有数据的日期补零"""
+        today = _today()
+        since = today - timedelta(days=days - 1)
+        rows = {row.day: row for row in DailyStats.query.filter(DailyStats.day >= since).all()}
+        with self._lock:
+            pending = {day: dict(counts) for day, counts in self._daily.items() if day >= since}
+
+        series = []
+        for offset in range(days):
+            day = since + timedelta(days=offset)
+            row = rows.get(day)
+            item = {'date': day.isoformat()}
+            for field, (_, column) in FIELDS.items():
+                item[column] = (getattr(row, column) if row else 0) + pending.get(day, {}).get(field, 0)
+            series.append(item)
+        return series
+
+    def _flush_at_exit(self):
+        if self.app is None:
+            return
+        try:
+            with self.app.app_context():
+                self.flush()
+        except Exception:
+            logger.exception('统计增量写入失败')
+
+
+site_stats = SiteStatsRecorder()
@@ -0,0 +1,90 @@
+# 后台维护任务
+# 计数类冗余字段（如 articles.likes_count、tags.published_count）由写接口增量维护，
+# 这里定期从明细表批量重算一次，修正异常中断等原因造成的偏差
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import func
+
+from models import db, Article, ArticleTag, Like, Tag
+
+logger = logging.getLogger('blog.tasks')
+
+
+def reconcile_likes_count():
+    """按 likes 表重算所有文章的 likes_count，返回被修正的文章数"""
+    actual = db.session.query(func.count(Like.id))\
+        .filter(Like.article_id == Article.id)\
+        .scalar_subquery()
+    fixed = Article.query.filter(Article.likes_count != actual)\
+        .update({Article.likes_count: actual}, synchronize_session=False)
+    db.session.commit()
+    return fixed
+
+
+def rebuild_tag_counts():
+    """按 article_tags 与文章状态重算所有标签的 published_count，返回被修正的标签数"""
+    actual = db.session.query(func.count(ArticleTag.id))\
+        .join(Article, Article.id == ArticleTag.article_id)\
+        .filter(ArticleTag.tag_id == Tag.id, Article.status == 'published')\
+        .scalar_subquery()
+    fixed = Tag.query.filter(Tag.published_count != actual)\
+        .update({Tag.published_count: actual}, synchronize_session=False)
+    db.session.commit()
+    return fixed
+
+
+class Scheduler:
+    """简单的周期任务调度器：每个任务一个守护线程，在应用上下文中执行"""
+
+    def __init__(self):
+        self.jobs = []
+        self.app = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def add_job(self, name, func, interval):
+        """注册周期任务，interval 为秒数或配置项名称，<= 0 表示不启用"""
+        self.jobs.append((name, func, interval))
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self.start)
+
+    def start(self):
+        """在当前进程中启动任务线程，重复调用不会重复启动
+
+        在第一次请求时启动而不是在 init_app 中：gunicorn 预加载应用后 fork 出的 worker
+        不会继承主进程的线程，CLI 命令和脚本也不需要这些线程
+        """
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            for name, func, interval in self.jobs:
+                if isinstance(interval, str):
+                    interval = self.app.config.get(interval)
+                if interval and interval > 0:
+                    thread = threading.Thread(
+                        target=self._run, args=(name, func, interval),
+                        name=f'task-{name}', daemon=True
+                    )
+                    thread.start()
+
+    def _run(self, name, func, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    func()
+            except Exception:
+                logger.exception('任务 %s 执行失败', name)
+                with self.app.app_context():
+                    db.session.rollback()
+
+
+scheduler = Scheduler()
@@ -0,0 +1,106 @@
+# 测试公共夹具
+# 每个测试使用一个临时 SQLite 文件库（多线程测试需要多个连接共享同一个库），按迁移升级表结构；
+# 关闭响应缓存与后台任务，避免缓存命中或后台线程的查询影响 SQL 条数的断言。
+#
+# 用法（在 back-end 目录下）：python -m pytest tests
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import create_app  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from models import db, User, Article, Tag, ArticleTag, Like  # noqa: E402
+from stats import site_stats, rebuild_stats  # noqa: E402
+from view_counter import view_counter  # noqa: E402
+
+TEST_CONFIG = {
+    'TESTING': True,
+    'SQLALCHEMY_ENGINE_OPTIONS': {},
+    'SQLALCHEMY_BINDS': {},
+    'RESPONSE_CACHE_ENABLED': False,
+    'LOG_LEVEL': 'ERROR',
+    'LOG_REQUEST_SAMPLE_RATE': 0,
+    # 写回线程空闲等待，测试结束时由夹具显式写回
+    'VIEW_COUNTER_FLUSH_INTERVAL': 3600,
+    'LIKES_RECONCILE_INTERVAL': 0,
+    'HOT_RANK_REBUILD_INTERVAL': 0,
+    'SEARCH_INDEX_REFRESH_INTERVAL': 0,
+    'STATS_FLUSH_INTERVAL': 0,
+    'STATS_RECONCILE_INTERVAL': 0,
+    'METRICS_WRITE_INTERVAL': 0,
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({**TEST_CONFIG, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}'})
+    with app.app_context():
+        upgrade()
+    yield app
+    # 删除临时库之前写回缓冲的浏览量与统计增量，避免退出时写入已删除的库
+    with app.app_context():
+        view_counter.flush()
+        site_stats.flush()
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def seed(users=3, tags=5, articles=30, liked_by_first_user=20):
+    """写入用户、标签、文章（每篇 2 个标签，作者轮流）与第一个用户的点赞，需在应用上下文中调用"""
+    now = datetime.utcnow().replace(microsecond=0)
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'password_hash': 'x', 'authority': 0, 'created_at': now, 'updated_at': now}
+        for i in range(1, users + 1)
+    ])
+    db.session.execute(Tag.__table__.insert(), [
+        {'id': i, 'name': f'标签{i}', 'color': 'blue', 'created_at': now} for i in range(1, tags + 1)
+    ])
+    db.session.execute(Article.__table__.insert(), [
+        {'id': i, 'title': f'文章 {i}', 'content': '正文内容 ' * 40, 'excerpt': '摘要', 'author_id': i % users + 1,
+         'status': 'published', 'views': i, 'likes_count': 1 if i <= liked_by_first_user else 0,
+         'created_at': now - timedelta(minutes=i), 'updated_at': now}
+        for i in range(1, articles + 1)
+    ])
+    db.session.execute(ArticleTag.__table__.insert(), [
+        {'article_id': i, 'tag_id': tag_id, 'created_at': now}
+        for i in range(1, articles + 1) for tag_id in (i % tags + 1, (i + 1) % tags + 1)
+    ])
+    # 空列表的 executemany 会生成一条只含默认值的 INSERT，没有点赞时跳过
+    if liked_by_first_user:
+        db.session.execute(Like.__table__.insert(), [
+            {'user_id': 1, 'article_id': i, 'created_at': now - timedelta(minutes=i)}
+            for i in range(1, liked_by_first_user + 1)
+        ])
+    rebuild_stats(db.session)
+    db.session.commit()
+
+
+@contextmanager
+def count_queries(app):
+    """统计代码块中执行的 SQL 条数；产出的列表只有一个元素，即条数
+
+    在应用上下文之外调用：测试客户端的请求会复用已推入的应用上下文，共用同一个数据库会话
+    """
+    with app.app_context():
+        engine = db.engine
+    count = [0]
+
+    def before_cursor_execute(*args):
+        count[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield count
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
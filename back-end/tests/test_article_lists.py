@@ -0,0 +1,71 @@
+# 文章列表接口的 SQL 条数
+# 作者与标签按整页批量加载，SQL 条数固定，与每页篇数无关；条数变化说明引入了逐行查询
+import pytest
+
+from conftest import count_queries, seed
+from models import db, Article
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        seed(articles=90)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('per_page', [5, 25])
+@pytest.mark.parametrize('url, queries', [
+    # 文章、总数、作者、标签
+    ('/api/articles?per_page={n}', 4),
+    # 多出一条 is_liked 查询
+    ('/api/articles?per_page={n}&viewer_id=1', 5),
+    # 游标分页不统计总数
+    ('/api/articles?cursor=&per_page={n}', 3),
+    ('/api/users/1/articles?per_page={n}', 4),
+])
+def test_list_query_count(app, client, url, queries, per_page):
+    with count_queries(app) as count:
+        response = client.get(url.format(n=per_page))
+    assert response.status_code == 200
+    assert len(response.json['articles']) == per_page
+    assert count[0] == queries
+
+
+@pytest.mark.parametrize('limit', [5, 25])
+@pytest.mark.parametrize('url, queries', [
+    # 文章、作者、标签（排行在内存中）
+    ('/api/articles/hot?limit={n}', 3),
+    ('/api/articles/hot?limit={n}&viewer_id=1', 4),
+])
+def test_hot_articles_query_count(app, client, url, queries, limit):
+    # 第一次请求时构建内存中的排行，不计入
+    client.get('/api/articles/hot')
+    with count_queries(app) as count:
+        response = client.get(url.format(n=limit))
+    assert response.status_code == 200
+    assert len(response.json) == limit
+    assert count[0] == queries
+
+
+@pytest.mark.parametrize('per_page', [5, 25])
+@pytest.mark.parametrize('url, queries', [
+    # 点赞与文章联表、总数、作者、标签
+    ('/api/users/1/likes?per_page={n}', 4),
+    # 游标分页不统计总数
+    ('/api/users/1/likes?cursor=&per_page={n}', 3),
+])
+def test_user_likes_query_count(app, client, url, queries, per_page):
+    # 第一个用户点赞了 20 篇；下线其中一篇，它不应占用分页位置，也不计入 total
+    with app.app_context():
+        Article.query.filter_by(id=2).update({'status': 'draft'})
+        db.session.commit()
+    with count_queries(app) as count:
+        response = client.get(url.format(n=per_page))
+    assert response.status_code == 200
+    articles = response.json['articles']
+    assert len(articles) == min(per_page, 19)
+    assert 2 not in [item['id'] for item in articles]
+    assert [item['liked_at'] for item in articles] == sorted((item['liked_at'] for item in articles), reverse=True)
+    if 'total' in response.json:
+        assert response.json['total'] == 19
+    assert count[0] == queries
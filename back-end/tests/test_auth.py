@@ -0,0 +1,40 @@
+# 访问令牌与权限
+import pytest
+
+from auth import token_auth
+from conftest import TEST_CONFIG, seed
+from main import create_app
+from models import db, User
+
+
+def test_refuses_to_start_without_secret_key(tmp_path):
+    config = {**TEST_CONFIG, 'TESTING': False, 'SECRET_KEY': None,
+              'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}'}
+    with pytest.raises(RuntimeError):
+        create_app(config)
+    assert create_app({**config, 'DEBUG': True}).config['SECRET_KEY'] == 'dev-secret-key-change-me'
+    assert create_app({**config, 'SECRET_KEY': 'configured'}).config['SECRET_KEY'] == 'configured'
+
+
+def test_demoted_or_deleted_admin_loses_admin_routes(app, client):
+    with app.app_context():
+        seed(articles=2, liked_by_first_user=0)
+        User.query.filter_by(id=1).update({'authority': 1})
+        db.session.commit()
+        token = token_auth.issue(db.session.get(User, 1))
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/api/admin/export/users', headers=headers).status_code == 200
+
+    # 令牌中仍是 auth=1，以用户记录为准
+    with app.app_context():
+        User.query.filter_by(id=1).update({'authority': 0})
+        db.session.commit()
+        token_auth.forget_user(1)
+    assert client.get('/api/admin/export/users', headers=headers).status_code == 403
+    assert client.delete('/api/articles/2', headers=headers).status_code == 403
+
+    with app.app_context():
+        User.query.filter_by(id=1).delete()
+        db.session.commit()
+        token_auth.forget_user(1)
+    assert client.get('/api/admin/export/users', headers=headers).status_code == 403
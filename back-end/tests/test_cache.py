@@ -0,0 +1,23 @@
+# 响应缓存的失效
+# 写接口改动数据后，依赖这些数据的缓存接口必须立即返回新结果
+from auth import token_auth
+from cache import response_cache
+from conftest import seed
+from models import db, User, Article
+
+
+def test_draft_update_with_new_tag_invalidates_tags(app, client, monkeypatch):
+    monkeypatch.setattr(response_cache, 'enabled', True)
+    with app.app_context():
+        seed(articles=3, liked_by_first_user=0)
+        Article.query.filter_by(id=1).update({'status': 'draft'})
+        db.session.commit()
+        author = db.session.get(User, db.session.get(Article, 1).author_id)
+        token = token_auth.issue(author)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    assert '新标签' not in [tag['name'] for tag in client.get('/api/tags').json]
+    # 草稿不影响任何标签的已发布文章数，但新建了标签
+    response = client.put('/api/articles/1', json={'tags': ['新标签']}, headers=headers)
+    assert response.status_code == 200
+    assert '新标签' in [tag['name'] for tag in client.get('/api/tags').json]
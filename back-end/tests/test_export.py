@@ -0,0 +1,56 @@
+# 流式导出的内存上限
+# 导出期间的内存峰值只与批大小有关；整表读入内存或整份拼接后再返回时峰值随行数增长，超过上限即测试失败。
+# 大表上的完整检查见 benchmarks/export_memory.py
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from auth import token_auth
+from models import db, User, Article
+
+ROWS = 20000
+# 流式导出时峰值约 6MB；2 万篇文章整表读入或整份拼接时峰值在 24MB 以上
+PEAK_CEILING_MB = 12
+
+
+@pytest.fixture
+def client(app):
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {'id': 1, 'username': 'admin', 'password_hash': 'x', 'authority': 1, 'created_at': now, 'updated_at': now}
+        ])
+        db.session.execute(Article.__table__.insert(), [
+            {'id': i, 'title': f'文章 {i}', 'content': '正文内容 ' * 40, 'excerpt': '摘要',
+             'author_id': 1, 'status': 'published', 'views': 0, 'likes_count': 0,
+             'created_at': now, 'updated_at': now}
+            for i in range(1, ROWS + 1)
+        ])
+        db.session.commit()
+    return app.test_client()
+
+
+@pytest.mark.parametrize('fmt, header_lines', [('ndjson', 0), ('csv', 1)])
+def test_export_streams_within_memory_ceiling(app, client, fmt, header_lines):
+    with app.app_context():
+        token = token_auth.issue(db.session.get(User, 1))
+    headers = {'Authorization': f'Bearer {token}'}
+    # 先导出一次只有一行的用户表，首次请求的导入与 SQL 编译缓存不计入峰值
+    assert client.get(f'/api/admin/export/users?format={fmt}', headers=headers).status_code == 200
+
+    tracemalloc.start()
+    try:
+        response = client.get(f'/api/admin/export/articles?format={fmt}', headers=headers, buffered=False)
+        assert response.status_code == 200
+        size = lines = 0
+        for chunk in response.response:
+            size += len(chunk)
+            lines += chunk.count(b'\n')
+        response.close()
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+    assert lines == ROWS + header_lines
+    assert peak < PEAK_CEILING_MB, f'size={size / 1024 / 1024:.1f}MB peak={peak:.1f}MB'
@@ -0,0 +1,71 @@
+# 查询计划
+# 记录各接口实际执行的 SQL，在 SQLite 上用 EXPLAIN QUERY PLAN 检查：主查询使用迁移 2 添加的复合索引，
+# 且没有任何语句全表扫描（SCAN）。索引或查询写法改动后计划退化即测试失败
+import pytest
+from sqlalchemy import event, inspect, text
+
+from conftest import seed
+from migrations import upgrade
+from models import db
+
+
+def capture_statements(app, client, url):
+    """请求 url，返回期间执行的 (SQL, 参数) 列表"""
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return engine, statements
+
+
+def query_plan(engine, statement, parameters):
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        seed(articles=90)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('url, indexes', [
+    # 文章列表：按状态过滤、按发布时间倒序
+    ('/api/articles?per_page=10', ['ix_articles_status_created_at']),
+    ('/api/articles?cursor=&per_page=10', ['ix_articles_status_created_at']),
+    # 按标签过滤：文章按时间顺序取出，用 (article_id, tag_id) 唯一索引判断是否带该标签
+    ('/api/articles?tag=标签1', ['ix_articles_status_created_at', 'uq_article_tags_article_tag']),
+    # 按作者过滤
+    ('/api/articles?author=user1', ['ix_articles_author_status_created_at']),
+    ('/api/users/1/articles', ['ix_articles_author_status_created_at']),
+    # 用户点赞过的文章：按点赞时间倒序
+    ('/api/users/1/likes', ['ix_likes_user_created_at']),
+])
+def test_queries_use_indexes(app, client, url, indexes):
+    engine, statements = capture_statements(app, client, url)
+    plans = [query_plan(engine, statement, parameters) for statement, parameters in statements]
+
+    main_plan = ' | '.join(plans[0])
+    for index in indexes:
+        assert f'INDEX {index} ' in main_plan, main_plan
+    for (statement, _), plan in zip(statements, plans):
+        assert not any(step.startswith('SCAN') for step in plan), f'{statement}\n{plan}'
+
+
+def test_upgrade_drops_unused_hot_articles_index(app):
+    # 热门排行在内存中计算，早期版本 2 创建的 (status, views, likes_count) 索引由版本 6 删除
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX ix_articles_status_views_likes ON articles (status, views, likes_count)'))
+            conn.execute(text('DELETE FROM schema_migrations WHERE version = 6'))
+        assert upgrade() == [6]
+        assert 'ix_articles_status_views_likes' not in {index['name'] for index in inspect(db.engine).get_indexes('articles')}
@@ -0,0 +1,51 @@
+# 批量导入
+# 每批文章用一条 executemany 写入（不退化为逐行 INSERT），读回的 id 与标签关联、ref 对应正确
+import json
+
+from sqlalchemy import event
+
+from conftest import seed
+from ingest import import_articles
+from models import db, Article, Tag, ArticleTag, Like
+
+
+def test_import_inserts_articles_in_one_statement(app):
+    with app.app_context():
+        seed(users=2, tags=2, articles=3, liked_by_first_user=0)
+        records = [
+            {'title': f'导入 {i}', 'content': '正文', 'author_id': i % 2 + 1, 'tags': [f'导入标签{i % 5}'], 'ref': i}
+            for i in range(50)
+        ]
+        # 同一作者、同名的两篇按插入顺序对应各自的标签
+        records += [
+            {'title': '同名', 'content': '正文', 'author_id': 1, 'tags': ['甲']},
+            {'title': '同名', 'content': '正文', 'author_id': 1, 'tags': ['乙']},
+        ]
+        records += [{'type': 'like', 'user_id': 2, 'article': i} for i in range(0, 50, 10)]
+        lines = [json.dumps(record, ensure_ascii=False) for record in records]
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            report = import_articles(lines, chunk_size=len(lines))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        assert report['inserted'] == 52 and report['likes'] == 5 and report['skipped'] == 0
+        assert sum(1 for statement in statements if statement.startswith('INSERT INTO articles')) == 1
+
+        tags_by_title = {}
+        for title, name in db.session.query(Article.title, Tag.name)\
+                .join(ArticleTag, ArticleTag.article_id == Article.id).join(Tag, Tag.id == ArticleTag.tag_id):
+            tags_by_title.setdefault(title, []).append(name)
+        for i in range(50):
+            assert tags_by_title[f'导入 {i}'] == [f'导入标签{i % 5}']
+        same_name = Article.query.filter_by(title='同名').order_by(Article.id).all()
+        assert [article.to_dict()['tags'] for article in same_name] == [['甲'], ['乙']]
+
+        liked = {title for title, in db.session.query(Article.title).join(Like, Like.article_id == Article.id)}
+        assert liked == {f'导入 {i}' for i in range(0, 50, 10)}
@@ -0,0 +1,43 @@
+# 点赞切换的并发正确性
+# 多个线程同时对同一篇文章切换点赞（同一用户的请求也会互相交错），结束后 likes_count 必须与 likes 表的行数一致
+import threading
+
+from auth import token_auth
+from conftest import seed
+from models import db, User, Article, Like
+from tasks import reconcile_likes_count
+
+USERS = 4
+THREADS_PER_USER = 4
+TOGGLES = 25
+
+
+def test_concurrent_like_toggles_keep_count_exact(app):
+    with app.app_context():
+        seed(users=USERS, articles=1, liked_by_first_user=0)
+        tokens = [token_auth.issue(user) for user in User.query.order_by(User.id)]
+
+    barrier = threading.Barrier(USERS * THREADS_PER_USER)
+    statuses = []
+
+    def worker(token):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        barrier.wait()
+        for _ in range(TOGGLES):
+            statuses.append(client.post('/api/articles/1/like', json={}, headers=headers).status_code)
+
+    threads = [threading.Thread(target=worker, args=(token,))
+               for token in tokens for _ in range(THREADS_PER_USER)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * (USERS * THREADS_PER_USER * TOGGLES)
+    with app.app_context():
+        rows = Like.query.filter_by(article_id=1).count()
+        assert rows <= USERS
+        assert db.session.query(Article.likes_count).filter_by(id=1).scalar() == rows
+        # 对账任务不应再修正任何文章
+        assert reconcile_likes_count() == 0
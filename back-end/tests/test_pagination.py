@@ -0,0 +1,35 @@
+# 分页参数
+# per_page 超出范围时按 1～100 截断：游标分页中 0 或负数曾导致 500（LIMIT 1 后取不到最后一条）或返回整张表
+import pytest
+
+from conftest import seed
+from models import Article
+from pagination import keyset_paginate
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        seed(users=1, articles=120, liked_by_first_user=110)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('per_page, expected', [(0, 1), (-3, 1), (1000, 100)])
+@pytest.mark.parametrize('url', [
+    '/api/articles?cursor=&per_page={n}',
+    '/api/articles?per_page={n}',
+    '/api/users/1/articles?cursor=&per_page={n}',
+    '/api/users/1/likes?cursor=&per_page={n}',
+    '/api/users/1/likes?per_page={n}',
+])
+def test_per_page_is_clamped(client, url, per_page, expected):
+    response = client.get(url.format(n=per_page))
+    assert response.status_code == 200
+    assert len(response.json['articles']) == expected
+
+
+@pytest.mark.parametrize('per_page', [0, -1])
+def test_keyset_paginate_rejects_non_positive_per_page(app, per_page):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            keyset_paginate(Article.query, Article.created_at, Article.id, None, per_page)
@@ -0,0 +1,168 @@
+# 浏览量写回缓冲
+# 读取文章时只在缓冲中累加浏览量，由后台线程按时间间隔或累计阈值
+# 合并成批量的 UPDATE articles SET views = views + n 写回数据库，
+# 避免每次 GET 都提交一次事务、对热门文章行加锁
+import atexit
+import logging
+import os
+import threading
+
+from sqlalchemy import bindparam
+
+from models import db, Article
+
+logger = logging.getLogger('blog.view_counter')
+
+
+class MemoryBackend:
+    """进程内计数后端（默认）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def incr(self, article_id, amount=1):
+        with self._lock:
+            self._counts[article_id] = self._counts.get(article_id, 0) + amount
+
+    def get(self, article_id):
+        return self._counts.get(article_id, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def drain(self):
+        """取出全部未写回的增量并清空"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return counts
+
+
+class RedisBackend:
+    """Redis 兼容后端，多个 worker 进程共享同一份缓冲
+
+    client 只需支持 hincrby / hget / hgetall / rename / delete，
+    例如 redis.Redis(decode_responses=True)。
+    """
+
+    def __init__(self, client, key='blog:pending_views'):
+        self.client = client
+        self.key = key
+
+    def incr(self, article_id, amount=1):
+        self.client.hincrby(self.key, article_id, amount)
+
+    def get(self, article_id):
+        return int(self.client.hget(self.key, article_id) or 0)
+
+    def snapshot(self):
+        return {int(k): int(v) for k, v in self.client.hgetall(self.key).items()}
+
+    def drain(self):
+        # 先改名再读取，改名之后的新增量会进入新的 key，不会丢失
+        draining_key = f'{self.key}:draining'
+        try:
+            self.client.rename(self.key, draining_key)
+        except Exception:
+            # key 不存在（没有待写回的增量）
+            return {}
+        counts = {int(k): int(v) for k, v in self.client.hgetall(draining_key).items()}
+        self.client.delete(draining_key)
+        return counts
+
+
+class ViewCounter:
+    """浏览量缓冲，用法与 Flask 扩展一致：view_counter.init_app(app)"""
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.app = None
+        self.interval = 5
+        self.threshold = 100
+        self._unflushed = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('VIEW_COUNTER_FLUSH_INTERVAL', 5)
+        app.config.setdefault('VIEW_COUNTER_FLUSH_THRESHOLD', 100)
+        self.app = app
+        self.interval = app.config['VIEW_COUNTER_FLUSH_INTERVAL']
+        self.threshold = app.config['VIEW_COUNTER_FLUSH_THRESHOLD']
+
+        app.before_request(self.start)
+
+    def start(self):
+        """在当前进程中启动写回线程，第一次请求时调用（原因同 tasks.Scheduler.start）
+
+        写回间隔 <= 0 时不启动线程，只在调用 flush 时写回（包括进程退出时）
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        if self.interval and self.interval > 0:
+            threading.Thread(target=self._run, name='view-counter-flush', daemon=True).start()
+        # 进程退出前把剩余增量写回
+        atexit.register(self.flush)
+
+    def incr(self, article_id, amount=1):
+        """记录一次浏览"""
+        self.backend.incr(article_id, amount)
+        with self._lock:
+            self._unflushed += amount
+            reached = self._unflushed >= self.threshold
+        if reached:
+            self._wakeup.set()
+
+    def pending(self, article_id):
+        """某篇文章尚未写回数据库的浏览量"""
+        return self.backend.get(article_id)
+
+    def pending_all(self):
+        """全部尚未写回数据库的浏览量 {article_id: delta}"""
+        return self.backend.snapshot()
+
+    def flush(self):
+        """把缓冲中的增量批量写回数据库，返回写回的文章数"""
+        if self.app is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                self._unflushed = 0
+            counts = self.backend.drain()
+            if not counts:
+                return 0
+
+            table = Article.__table__
+            stmt = table.update()\
+                .where(table.c.id == bindparam('b_id'))\
+                .values(views=table.c.views + bindparam('b_delta'))
+            params = [{'b_id': article_id, 'b_delta': delta} for article_id, delta in counts.items()]
+            try:
+                with self.app.app_context():
+                    db.session.execute(stmt, params)
+                    db.session.commit()
+            except Exception:
+                # 写回失败时把增量放回缓冲，等待下次重试
+                for article_id, delta in counts.items():
+                    self.backend.incr(article_id, delta)
+                logger.exception('浏览量写回失败')
+                return 0
+            return len(counts)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,4 @@
+# WSGI 入口，供 gunicorn 等服务器使用：gunicorn -w 8 --preload wsgi:app
+from main import create_app
+
+app = create_app()
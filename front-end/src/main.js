@@ -1,9 +1,28 @@
 import Antd from 'ant-design-vue';
+import axios from 'axios'
 import 'ant-design-vue/dist/reset.css';
 import { createApp } from 'vue'
 import App from './App.vue'
 import router from './router'
 
+// 登录后把访问令牌附加到所有接口请求上
+axios.interceptors.request.use((config) => {
+  const token = localStorage.getItem('token')
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`
+  }
+  return config
+})
+
+// 令牌过期或无效时清除登录状态，由各页面按未登录处理
+axios.interceptors.response.use(undefined, (error) => {
+  if (error.response?.status === 401 && !error.config?.url?.endsWith('/api/login')) {
+    localStorage.removeItem('token')
+    localStorage.removeItem('user')
+  }
+  return Promise.reject(error)
+})
+
 const app = createApp(App)
 
 app.use(router)
@@ -72,8 +72,8 @@ router.beforeEach((to, from, next) => {
     const raw = localStorage.getItem('user')
     let user = null
     try { user = raw ? JSON.parse(raw) : null } catch (_) { user = null }
-    if (!user || !user.id) {
-      // 清理无效的旧数据，避免产生 /users// 请求
+    if (!user || !user.id || !localStorage.getItem('token')) {
+      // 清理无效的旧数据（含升级前没有访问令牌的登录状态），避免产生 /users// 请求
       localStorage.removeItem('user')
       return next({ path: '/login', query: { redirect: to.fullPath } })
     }